@@ -1,23 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, UploadFile, WebSocket, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app.schemas.user import UserCreate, UserResponse, UserMeResponse, EncodeRequest, EncodeResponse, DecodeRequest, DecodeResponse
-from app.cruds.user import create_user
-from app.services.security import verify_password, create_access_token, get_current_user, oauth2_scheme
-from app.services.encoding import encode_data, decode_data
-from app.db import get_db
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.schemas.user import (
+    UserCreate, UserResponse, UserMeResponse, EncodeRequest, EncodeResponse, DecodeRequest, DecodeResponse,
+    EncodeBatchRequest, EncodeBatchResponse, DecodeBatchRequest, DecodeBatchResponse, CodebookCreate, CodebookInfo,
+    ImportReport, JobInfo,
+)
+from app.cruds.user import create_user_async, get_user_by_email_async
+from app.services.security import create_access_token, get_current_user, get_admin_user, oauth2_scheme
+from app.services.encoding import (
+    encode_bytes, decode_bytes, encode_blocks, decode_block, decode_blocks, encode_stream, StreamDecoder,
+)
+from app.services.streaming import spool_upload, iter_spool
+from app.services.websocket_codec import encode_session, decode_session
+from app.services.codec import encode_request, decode_request, encode_many, decode_many
+from app.services.pool import call_with_pool, call_with_pool_async
+from app.services.hashing import check_password, hashing_stats
+from app.services.codebooks import registry
+from app.services.metrics import track_codec, utf8_size
+from app.services.profiling import profiled, run_in_threadpool
+from app.services.fastjson import FastJSONResponse, FastJSONRoute
+from app.services.bulk_import import import_users, detect_format
+from app.services.jobs import get_broker, DONE, FAILED
+from app.services.result_cache import result_cache, with_key
+from app.db import get_async_db, get_async_read_db
+import asyncio
+import io
 from datetime import timedelta
+from typing import Dict, List, Literal, Optional
 from app.core.config import settings
 from app.models.user import User
 
-auth_router = APIRouter()
+auth_router = APIRouter(route_class=FastJSONRoute)
 
 @auth_router.post("/sign-up/", response_model=UserResponse)
-def sign_up(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def sign_up(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await get_user_by_email_async(db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    new_user = create_user(db, email=user.email, password=user.password)
+    try:
+        new_user = await create_user_async(db, email=user.email, password=user.password)
+    except IntegrityError:
+        # Параллельная регистрация с тем же email успела раньше
+        raise HTTPException(status_code=400, detail="Email already registered")
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": new_user.email}, expires_delta=access_token_expires
@@ -25,9 +52,9 @@ def sign_up(user: UserCreate, db: Session = Depends(get_db)):
     return UserResponse(id=new_user.id, email=new_user.email, token=access_token)
 
 @auth_router.post("/login/", response_model=dict)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    u = db.query(User).filter(User.email == form_data.username).first()
-    if not u or not verify_password(form_data.password, u.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_read_db)):
+    u = await get_user_by_email_async(db, form_data.username)
+    if not u or not await check_password(form_data.password, u.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
@@ -45,23 +72,253 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     }
 
 @auth_router.get("/users/me/", response_model=UserMeResponse)
-def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: User = Depends(get_current_user)):
     return current_user
 
-@auth_router.post("/encode", response_model=EncodeResponse)
+@auth_router.get("/stats/hashing", response_model=dict)
+@profiled
+def read_hashing_stats():
+    return hashing_stats()
+
+@auth_router.post("/admin/users/import", response_model=ImportReport)
+async def import_users_file(
+    file: UploadFile,
+    format: Optional[Literal["csv", "jsonl"]] = Query(None),
+    admin: User = Depends(get_admin_user),
+):
+    # Файл уже сохранён во временный файл, импорт идёт в пуле потоков
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        return await run_in_threadpool(import_users, stream, format or detect_format(file.filename or ""))
+    except UnicodeDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Import failed: {str(e)}")
+    finally:
+        stream.detach()
+
+def get_codebook(codebook_id: str) -> Dict[str, str]:
+    codes = registry.get(codebook_id)
+    if codes is None:
+        raise HTTPException(status_code=404, detail=f"Codebook {codebook_id} not found")
+    return codes
+
+@auth_router.get("/codebooks", response_model=List[CodebookInfo])
+@profiled
+def list_codebooks():
+    return registry.summary()
+
+@auth_router.post("/codebooks", response_model=CodebookInfo, status_code=status.HTTP_201_CREATED)
+@profiled
+def create_codebook(codebook: CodebookCreate, current_user: User = Depends(get_current_user)):
+    try:
+        codes = registry.register(codebook.id, codebook.sample)
+    except KeyError:
+        raise HTTPException(status_code=409, detail=f"Codebook {codebook.id} already exists")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return CodebookInfo(id=codebook.id, symbols=len(codes))
+
+@auth_router.post("/encode", response_model=EncodeResponse, response_model_exclude_none=True, response_class=FastJSONResponse)
+@profiled
 def encode(request: EncodeRequest):
-    encoded_data, huffman_codes, padding = encode_data(request.text, request.key)
-    return EncodeResponse(
-        encoded_data=encoded_data,
-        key=request.key,
-        huffman_codes=huffman_codes,
-        padding=padding
-    )
+    codebook = get_codebook(request.codebook_id) if request.codebook_id is not None else None
+    cache_key = result_cache.key("encode", request)
+    body = result_cache.get("encode", cache_key)
+    if body is None:
+        with track_codec("encode", utf8_size(request.text)):
+            response = encode_request(request, codebook)
+        body = response.model_dump_json(exclude_none=True, exclude={"key"}).encode("utf-8")
+        result_cache.set(cache_key, body)
+    return Response(content=with_key(body, request.key), media_type="application/json")
 
-@auth_router.post("/decode", response_model=DecodeResponse)
+@auth_router.post("/decode", response_model=DecodeResponse, response_class=FastJSONResponse)
+@profiled
 def decode(request: DecodeRequest):
+    codebook = get_codebook(request.codebook_id) if request.codebook_id is not None else None
+    cache_key = result_cache.key("decode", request)
+    body = result_cache.get("decode", cache_key)
+    if body is None:
+        try:
+            with track_codec("decode", len(request.encoded_data)):
+                response = decode_request(request, codebook)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Decoding failed: {str(e)}")
+        body = response.model_dump_json().encode("utf-8")
+        result_cache.set(cache_key, body)
+    return Response(content=body, media_type="application/json")
+
+async def run_batch(func, items: list) -> list:
+    # Элементы делятся на куски по числу процессов, чтобы не платить за пересылку
+    # каждого элемента отдельно; порядок результатов совпадает с порядком запроса
+    if len(items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch is limited to {settings.BATCH_MAX_ITEMS} items")
+    codebooks = {}
+    for item in items:
+        codes = registry.get(item.codebook_id) if item.codebook_id is not None else None
+        if codes is not None:
+            codebooks[item.codebook_id] = codes
+    loop = asyncio.get_running_loop()
+    size = max(1, -(-len(items) // (settings.ENCODE_WORKERS * 4)))
+    chunks = [items[start:start + size] for start in range(0, len(items), size)]
+    results = await call_with_pool_async(
+        lambda pool: asyncio.gather(*(loop.run_in_executor(pool, func, chunk, codebooks) for chunk in chunks))
+    )
+    return [result for chunk in results for result in chunk]
+
+@auth_router.post("/encode/batch", response_model=EncodeBatchResponse, response_model_exclude_none=True, response_class=FastJSONResponse)
+async def encode_batch(request: EncodeBatchRequest):
+    with track_codec("encode_batch", sum(utf8_size(item.text) for item in request.items)):
+        return EncodeBatchResponse(results=await run_batch(encode_many, request.items))
+
+@auth_router.post("/decode/batch", response_model=DecodeBatchResponse, response_model_exclude_none=True, response_class=FastJSONResponse)
+async def decode_batch(request: DecodeBatchRequest):
+    with track_codec("decode_batch", sum(len(item.encoded_data) for item in request.items)):
+        return DecodeBatchResponse(results=await run_batch(decode_many, request.items))
+
+# Задача сохраняется в брокере, а ответ с её id уходит сразу; результат забирается
+# через /jobs/{job_id}/result в том же виде, что и у /encode и /decode
+@auth_router.post("/jobs/encode", response_model=JobInfo, status_code=status.HTTP_202_ACCEPTED)
+async def submit_encode_job(request: EncodeRequest):
+    if request.codebook_id is not None:
+        get_codebook(request.codebook_id)
+    return await run_in_threadpool(get_broker().submit, "encode", request.model_dump_json())
+
+@auth_router.post("/jobs/decode", response_model=JobInfo, status_code=status.HTTP_202_ACCEPTED)
+async def submit_decode_job(request: DecodeRequest):
+    if request.codebook_id is not None:
+        get_codebook(request.codebook_id)
+    return await run_in_threadpool(get_broker().submit, "decode", request.model_dump_json())
+
+async def get_job(job_id: str):
+    job = await run_in_threadpool(get_broker().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@auth_router.get("/jobs/{job_id}", response_model=JobInfo)
+async def read_job(job_id: str):
+    return await get_job(job_id)
+
+@auth_router.get("/jobs/{job_id}/result")
+async def read_job_result(job_id: str, key: Optional[str] = Header(None, alias="X-Key")):
+    job = await get_job(job_id)
+    if job.status == FAILED:
+        raise HTTPException(status_code=422, detail=job.error)
+    if job.status != DONE:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status}")
+    # Результат /encode хранится без ключа, ключ присылает клиент
+    if job.kind == "encode" and not key:
+        raise HTTPException(status_code=400, detail="X-Key header is required for encode job results")
+    result = await run_in_threadpool(get_broker().result, job_id)
+    if result is None:
+        # Срок хранения истёк между двумя запросами к брокеру
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    result = result.encode("utf-8")
+    if job.kind == "encode":
+        result = with_key(result, key)
+    return Response(content=result, media_type="application/json")
+
+# Тело запроса и ответа у бинарных эндпоинтов — сырые байты без JSON и base64
+BINARY_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/octet-stream": {"schema": {"type": "string", "format": "binary"}}},
+    }
+}
+
+@auth_router.post("/encode/raw", response_class=Response, openapi_extra=BINARY_BODY)
+async def encode_raw(request: Request, key: str = Header(..., alias="X-Key", min_length=1)):
+    data = await request.body()
+    try:
+        with track_codec("encode_raw", len(data)):
+            encoded = await run_in_threadpool(encode_bytes, data, key.encode("utf-8"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Encoding failed: {str(e)}")
+    return Response(content=encoded, media_type="application/octet-stream")
+
+@auth_router.post("/decode/raw", response_class=Response, openapi_extra=BINARY_BODY)
+async def decode_raw(request: Request, key: str = Header(..., alias="X-Key", min_length=1)):
+    data = await request.body()
+    try:
+        with track_codec("decode_raw", len(data)):
+            decoded = await run_in_threadpool(decode_bytes, data, key.encode("utf-8"))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Decoding failed: {str(e)}")
+    return Response(content=decoded, media_type="application/octet-stream")
+
+@auth_router.post("/encode/blocks", response_class=Response, openapi_extra=BINARY_BODY)
+async def encode_blocks_raw(
+    request: Request,
+    key: str = Header(..., alias="X-Key", min_length=1),
+    block_size: int = Query(default=settings.ENCODE_BLOCK_SIZE, ge=1024),
+):
+    data = await request.body()
     try:
-        decoded_text = decode_data(request.encoded_data, request.key, request.huffman_codes, request.padding)
-        return DecodeResponse(decoded_text=decoded_text)
+        with track_codec("encode_blocks", len(data)):
+            encoded = await run_in_threadpool(
+                call_with_pool, lambda pool: encode_blocks(data, key.encode("utf-8"), block_size, pool)
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Encoding failed: {str(e)}")
+    return Response(content=encoded, media_type="application/octet-stream")
+
+@auth_router.post("/decode/blocks", response_class=Response, openapi_extra=BINARY_BODY)
+async def decode_blocks_raw(
+    request: Request,
+    key: str = Header(..., alias="X-Key", min_length=1),
+    block: Optional[int] = Query(default=None, ge=0),
+):
+    data = await request.body()
+    try:
+        with track_codec("decode_blocks", len(data)):
+            if block is None:
+                decoded = await run_in_threadpool(
+                    call_with_pool, lambda pool: decode_blocks(data, key.encode("utf-8"), pool)
+                )
+            else:
+                decoded = await run_in_threadpool(decode_block, data, key.encode("utf-8"), block)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Decoding failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=f"Decoding failed: {str(e)}")
+    return Response(content=decoded, media_type="application/octet-stream")
+
+@auth_router.post("/encode/stream", response_class=StreamingResponse, openapi_extra=BINARY_BODY)
+async def encode_stream_raw(request: Request, key: str = Header(..., alias="X-Key", min_length=1)):
+    spool, freq = await spool_upload(request.stream())
+    return StreamingResponse(encode_stream(iter_spool(spool), key.encode("utf-8"), freq), media_type="application/octet-stream")
+
+@auth_router.post("/decode/stream", response_class=StreamingResponse, openapi_extra=BINARY_BODY)
+async def decode_stream_raw(request: Request, key: str = Header(..., alias="X-Key", min_length=1)):
+    stream = request.stream()
+    # Заголовок разбирается до начала ответа, чтобы ошибки в нём вернулись как 400
+    try:
+        decoder = StreamDecoder(key.encode("utf-8"))
+        first = b""
+        async for chunk in stream:
+            first += await run_in_threadpool(decoder.feed, chunk)
+            if decoder.table is not None or decoder.stored:
+                break
+        else:
+            first += decoder.finish()
+            return Response(content=first, media_type="application/octet-stream")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Decoding failed: {str(e)}")
+
+    async def body():
+        if first:
+            yield first
+        async for chunk in stream:
+            data = await run_in_threadpool(decoder.feed, chunk)
+            if data:
+                yield data
+        yield await run_in_threadpool(decoder.finish)
+
+    return StreamingResponse(body(), media_type="application/octet-stream")
+
+@auth_router.websocket("/ws/encode")
+async def ws_encode(websocket: WebSocket):
+    await encode_session(websocket)
+
+@auth_router.websocket("/ws/decode")
+async def ws_decode(websocket: WebSocket):
+    await decode_session(websocket)
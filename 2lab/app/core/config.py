@@ -9,5 +9,56 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     DATABASE_URL: str = "sqlite:///app.db"
+    ASYNC_DATABASE_URL: str = "sqlite+aiosqlite:///app.db"
+    # Профиль SQLite, применяется к каждому новому соединению
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_MMAP_SIZE: int = 256 << 20
+    SQLITE_CACHE_SIZE: int = -64000
+    SQLITE_BUSY_TIMEOUT: int = 5000
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_READ_ONLY_POOL: bool = True
+    ENCODE_WORKERS: int = os.cpu_count() or 1
+    ENCODE_BLOCK_SIZE: int = 1 << 20
+    CODEBOOK_DIR: str = "codebooks"
+    BATCH_MAX_ITEMS: int = 1000
+    STREAM_CHUNK_SIZE: int = 1 << 16
+    STREAM_SPOOL_MEMORY: int = 8 << 20
+    WS_MAX_TEXT_SIZE: int = 64 << 20
+    HASH_WORKERS: int = os.cpu_count() or 1
+    HASH_QUEUE_SIZE: int = 64
+    BCRYPT_ROUNDS: int = 12
+    USER_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL: float = 60.0
+    TOKEN_CACHE_SIZE: int = 4096
+    # Email администраторов через запятую
+    ADMIN_EMAILS: str = ""
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_WORKERS: int = os.cpu_count() or 1
+    PROFILE_DIR: str = "profiles"
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_TOP: int = 5
+    PROFILE_MAX_FILES: int = 100
+    COMPRESSION_MIN_SIZE: int = 1024
+    GZIP_LEVEL: int = 1
+    BROTLI_QUALITY: int = 4
+    # Готовая схема OpenAPI (python main.py --dump-openapi <путь>); пусто — строить при первом запросе
+    OPENAPI_SCHEMA_PATH: str = ""
+    # Кэш ответов /encode и /decode; пустой RESULT_CACHE_DIR — только в памяти
+    RESULT_CACHE_MEMORY_BYTES: int = 64 << 20
+    RESULT_CACHE_DIR: str = ""
+    RESULT_CACHE_DISK_BYTES: int = 1 << 30
+    # Фоновые задачи: "memory" — в процессе API, "sqlite" — в JOB_DATABASE для
+    # отдельных воркеров (python -m app.services.jobs)
+    JOB_BROKER: str = "memory"
+    JOB_DATABASE: str = "jobs.db"
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY: float = 1.0
+    JOB_RESULT_TTL: float = 3600.0
+    JOB_LEASE_TIMEOUT: float = 600.0
+    JOB_POLL_INTERVAL: float = 0.5
+    JOB_LOCAL_WORKERS: int = 1
+    JOB_WORKER_PROCESSES: int = 1
 
 settings = Settings()
\ No newline at end of file
@@ -1,6 +1,10 @@
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.user import User
-from app.services.security import get_password_hash, verify_password
+from app.services.security import get_password_hash, verify_password, invalidate_user
+from app.services.hashing import hash_password
 
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
@@ -11,4 +15,17 @@ def create_user(db: Session, email: str, password: str):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
-    return db_user
\ No newline at end of file
+    invalidate_user(email)
+    return db_user
+
+async def get_user_by_email_async(db: AsyncSession, email: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def create_user_async(db: AsyncSession, email: str, password: str) -> User:
+    hashed_password = await hash_password(password)
+    db_user = User(email=email, hashed_password=hashed_password)
+    db.add(db_user)
+    await db.commit()
+    invalidate_user(email)
+    return db_user
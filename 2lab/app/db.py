@@ -1,14 +1,65 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core.config import settings
+from app.services.metrics import instrument_engine
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///app.db"
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
+POOL_OPTIONS = {"pool_size": settings.DB_POOL_SIZE, "max_overflow": settings.DB_MAX_OVERFLOW}
+
+def apply_sqlite_profile(dbapi_connection, connection_record):
+    # journal_mode хранится в самом файле базы, остальные настройки действуют на соединение
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT}")
+    if connection_record.info.get("read_only") is None:
+        cursor.execute(f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size = {settings.SQLITE_CACHE_SIZE}")
+    cursor.close()
+
+def read_only_url(url: str) -> str:
+    # sqlite:///app.db -> sqlite:///file:app.db?mode=ro&uri=true
+    url = make_url(url)
+    return url.set(database=f"file:{url.database}", query={**url.query, "mode": "ro", "uri": "true"}).render_as_string(hide_password=False)
+
+# Синхронный движок остаётся для скриптов, init_db и Alembic
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, **POOL_OPTIONS
 )
+event.listen(engine, "connect", apply_sqlite_profile)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок для эндпоинтов. По умолчанию aiosqlite работает без пула и
+# на каждую сессию открывает соединение со своим потоком, поэтому пул задаётся явно
+async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, poolclass=AsyncAdaptedQueuePool, **POOL_OPTIONS)
+event.listen(async_engine.sync_engine, "connect", apply_sqlite_profile)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+# Отдельный пул соединений только для чтения для поиска пользователей: в режиме WAL
+# читатели не ждут запись из /sign-up
+if settings.DB_READ_ONLY_POOL:
+    async_read_engine = create_async_engine(
+        read_only_url(settings.ASYNC_DATABASE_URL), poolclass=AsyncAdaptedQueuePool, **POOL_OPTIONS
+    )
+
+    @event.listens_for(async_read_engine.sync_engine, "connect")
+    def apply_read_only_profile(dbapi_connection, connection_record):
+        connection_record.info["read_only"] = True
+        apply_sqlite_profile(dbapi_connection, connection_record)
+else:
+    async_read_engine = async_engine
+# Время запросов к базе по событиям курсора
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+if async_read_engine is not async_engine:
+    instrument_engine(async_read_engine.sync_engine)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, expire_on_commit=False, autoflush=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -18,5 +69,13 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
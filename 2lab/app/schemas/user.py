@@ -1,5 +1,6 @@
-from pydantic import BaseModel
-from typing import Dict
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
 
 class UserCreate(BaseModel):
     email: str
@@ -22,19 +23,74 @@ class UserMeResponse(BaseModel):
 
 class EncodeRequest(BaseModel):
     text: str
-    key: str
+    key: str = Field(min_length=1)
+    canonical: bool = False
+    codebook_id: Optional[str] = None
 
 class EncodeResponse(BaseModel):
     encoded_data: str
     key: str
-    huffman_codes: Dict[str, str]
+    huffman_codes: Optional[Dict[str, str]] = None
+    code_lengths: Optional[str] = None
+    codebook_id: Optional[str] = None
+    mode: Optional[Literal["huffman", "stored"]] = None
     padding: int
 
 class DecodeRequest(BaseModel):
     encoded_data: str
-    key: str
-    huffman_codes: Dict[str, str]
-    padding: int
+    key: str = Field(min_length=1)
+    huffman_codes: Optional[Dict[str, str]] = None
+    code_lengths: Optional[str] = None
+    codebook_id: Optional[str] = None
+    mode: Optional[Literal["huffman", "stored"]] = None
+    padding: int = Field(ge=0, le=7)
 
 class DecodeResponse(BaseModel):
-    decoded_text: str
\ No newline at end of file
+    decoded_text: str
+
+class EncodeBatchRequest(BaseModel):
+    items: List[EncodeRequest]
+
+class EncodeBatchItem(BaseModel):
+    result: Optional[EncodeResponse] = None
+    error: Optional[str] = None
+
+class EncodeBatchResponse(BaseModel):
+    results: List[EncodeBatchItem]
+
+class DecodeBatchRequest(BaseModel):
+    items: List[DecodeRequest]
+
+class DecodeBatchItem(BaseModel):
+    result: Optional[DecodeResponse] = None
+    error: Optional[str] = None
+
+class DecodeBatchResponse(BaseModel):
+    results: List[DecodeBatchItem]
+
+class CodebookCreate(BaseModel):
+    id: str = Field(pattern=r"^[A-Za-z0-9_.-]{1,64}$")
+    sample: str
+
+class ImportIssue(BaseModel):
+    line: int
+    email: Optional[str] = None
+    error: str
+
+class ImportReport(BaseModel):
+    created: int
+    duplicates: List[ImportIssue]
+    invalid: List[ImportIssue]
+
+class CodebookInfo(BaseModel):
+    id: str
+    symbols: int
+
+class JobInfo(BaseModel):
+    id: str
+    kind: Literal["encode", "decode"]
+    status: Literal["queued", "running", "done", "failed"]
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    expires_at: Optional[datetime] = None
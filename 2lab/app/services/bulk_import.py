@@ -0,0 +1,147 @@
+import argparse
+import csv
+import io
+import json
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.models.user import User
+from app.services.security import get_password_hash
+
+# Массовый импорт пользователей: записи читаются потоком, пароли хэшируются
+# пачками на всех ядрах, пачка вставляется одним executemany в одной транзакции.
+# Пока вставляется одна пачка, пул процессов уже хэширует следующую.
+
+def read_records(stream: TextIO, fmt: str) -> Iterator[Tuple[int, Optional[str], Optional[str], Optional[str]]]:
+    # (номер строки, email, пароль, ошибка разбора)
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row.get("email"), row.get("password"), None
+    elif fmt == "jsonl":
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, None, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield number, None, None, "Expected a JSON object"
+                continue
+            yield number, row.get("email"), row.get("password"), None
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+def detect_format(filename: str) -> str:
+    return "jsonl" if filename.endswith((".jsonl", ".ndjson")) else "csv"
+
+def _insert_batch(engine: Engine, rows: List[Tuple[int, str]], hashes: Iterable[str], report: Dict[str, list]) -> int:
+    values = [{"email": email, "hashed_password": hashed} for (_, email), hashed in zip(rows, hashes)]
+    if not values:
+        return 0
+    try:
+        with engine.begin() as connection:
+            connection.execute(insert(User), values)
+        return len(values)
+    except IntegrityError:
+        pass
+    # Кто-то успел создать часть пользователей между проверкой и вставкой:
+    # повторяем пачку построчно, чтобы найти дубликаты
+    created = 0
+    for (number, email), value in zip(rows, values):
+        try:
+            with engine.begin() as connection:
+                connection.execute(insert(User), value)
+            created += 1
+        except IntegrityError:
+            report["duplicates"].append({"line": number, "email": email, "error": "Email already registered"})
+    return created
+
+def import_users(
+    stream: TextIO,
+    fmt: str,
+    engine: Optional[Engine] = None,
+    executor: Optional[Executor] = None,
+    batch_size: Optional[int] = None,
+) -> dict:
+    if engine is None:
+        from app.db import engine
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=settings.IMPORT_WORKERS)
+    report = {"created": 0, "duplicates": [], "invalid": []}
+    seen = set()
+    previous = None
+    records = read_records(stream, fmt)
+    try:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            rows, passwords = [], []
+            for number, email, password, error in batch:
+                if error is None and (not isinstance(email, str) or not email):
+                    error = "Missing email"
+                elif error is None and (not isinstance(password, str) or not password):
+                    error = "Missing password"
+                if error is not None:
+                    report["invalid"].append({"line": number, "email": email if isinstance(email, str) else None, "error": error})
+                elif email in seen:
+                    report["duplicates"].append({"line": number, "email": email, "error": "Duplicate email in import"})
+                else:
+                    seen.add(email)
+                    rows.append((number, email))
+                    passwords.append(password)
+            if rows:
+                with engine.connect() as connection:
+                    existing = set(connection.scalars(select(User.email).where(User.email.in_([email for _, email in rows]))))
+                if existing:
+                    kept = []
+                    for row, password in zip(rows, passwords):
+                        if row[1] in existing:
+                            report["duplicates"].append({"line": row[0], "email": row[1], "error": "Email already registered"})
+                        else:
+                            kept.append((row, password))
+                    rows = [row for row, _ in kept]
+                    passwords = [password for _, password in kept]
+            chunksize = max(1, len(passwords) // (settings.IMPORT_WORKERS * 4))
+            hashes = executor.map(get_password_hash, passwords, chunksize=chunksize)
+            if previous is not None:
+                report["created"] += _insert_batch(engine, *previous, report)
+            previous = (rows, hashes)
+        if previous is not None:
+            report["created"] += _insert_batch(engine, *previous, report)
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import users from CSV (email,password) or JSONL")
+    parser.add_argument("path", help="input file, '-' for stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=settings.IMPORT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=settings.IMPORT_WORKERS)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        if args.path == "-":
+            stream = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+            report = import_users(stream, fmt, executor=executor, batch_size=args.batch_size)
+        else:
+            with open(args.path, encoding="utf-8", newline="") as stream:
+                report = import_users(stream, fmt, executor=executor, batch_size=args.batch_size)
+    json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
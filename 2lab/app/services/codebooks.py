@@ -0,0 +1,74 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.encoding import train_codebook, code_lengths_header, codes_from_header
+
+CODEBOOK_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+class CodebookRegistry:
+    # Именованные заранее обученные словари кодов. Словарь хранится на диске как
+    # заголовок с длинами канонических кодов и после регистрации не меняется.
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.codebooks: Dict[str, Dict[str, str]] = {}
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".json") and name[:-5] not in self.codebooks:
+                self.load_file(name[:-5])
+
+    def load_file(self, codebook_id: str):
+        try:
+            with open(os.path.join(self.directory, f"{codebook_id}.json"), encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        self.codebooks[stored["id"]] = codes_from_header(stored["code_lengths"])
+
+    def get(self, codebook_id: str) -> Optional[Dict[str, str]]:
+        codes = self.codebooks.get(codebook_id)
+        if codes is not None or not CODEBOOK_ID_PATTERN.match(codebook_id):
+            return codes
+        # Словарь мог зарегистрировать другой процесс: соседний воркер uvicorn
+        # или API для воркера задач
+        with self.lock:
+            if codebook_id not in self.codebooks:
+                self.load_file(codebook_id)
+            return self.codebooks.get(codebook_id)
+
+    def summary(self) -> List[Dict[str, object]]:
+        with self.lock:
+            self.load()
+            items = sorted(self.codebooks.items())
+        return [{"id": codebook_id, "symbols": len(codes)} for codebook_id, codes in items]
+
+    def register(self, codebook_id: str, sample: str) -> Dict[str, str]:
+        codes = train_codebook(sample)
+        with self.lock:
+            if codebook_id in self.codebooks:
+                raise KeyError(codebook_id)
+            os.makedirs(self.directory, exist_ok=True)
+            # Файл пишется во временный и появляется под своим именем через link:
+            # другие процессы не прочтут его наполовину записанным, а словарь,
+            # созданный другим процессом, не перезаписывается
+            path = os.path.join(self.directory, f"{codebook_id}.json")
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump({"id": codebook_id, "code_lengths": code_lengths_header(codes)}, f)
+            try:
+                os.link(temporary, path)
+            except FileExistsError:
+                raise KeyError(codebook_id)
+            finally:
+                os.remove(temporary)
+            self.codebooks[codebook_id] = codes
+        return codes
+
+registry = CodebookRegistry(settings.CODEBOOK_DIR)
@@ -0,0 +1,88 @@
+from typing import Dict, List, Optional
+from app.schemas.user import EncodeRequest, EncodeResponse, DecodeRequest, DecodeResponse, EncodeBatchItem, DecodeBatchItem
+from app.services.encoding import encode_data, decode_data, code_lengths_header, codes_from_header, MODE_HUFFMAN, MODE_STORED
+
+# Функции принимают уже найденный словарь из реестра, а не его id: пакетные
+# запросы выполняются в отдельных процессах, где реестр может быть устаревшим
+
+def encode_request(request: EncodeRequest, codebook: Optional[Dict[str, str]] = None) -> EncodeResponse:
+    # Если в тексте есть символы вне словаря, строим коды для запроса как обычно
+    if codebook is not None and codebook.keys() >= set(request.text):
+        encoded_data, _, padding, _ = encode_data(request.text, request.key, codes=codebook)
+        return encode_response(request, encoded_data, codebook, padding, MODE_HUFFMAN, True)
+    encoded_data, huffman_codes, padding, mode = encode_data(request.text, request.key, request.canonical)
+    return encode_response(request, encoded_data, huffman_codes, padding, mode, False)
+
+def encode_response(
+    request: EncodeRequest, encoded_data: str, huffman_codes: Dict[str, str], padding: int, mode: str, from_codebook: bool
+) -> EncodeResponse:
+    if from_codebook:
+        return EncodeResponse(
+            encoded_data=encoded_data,
+            key=request.key,
+            codebook_id=request.codebook_id,
+            padding=padding
+        )
+    # Несжимаемый текст отдаётся без словаря; mode заполняется только в этом случае
+    if mode == MODE_STORED:
+        return EncodeResponse(
+            encoded_data=encoded_data,
+            key=request.key,
+            mode=mode,
+            padding=padding
+        )
+    if request.canonical:
+        return EncodeResponse(
+            encoded_data=encoded_data,
+            key=request.key,
+            code_lengths=code_lengths_header(huffman_codes),
+            padding=padding
+        )
+    return EncodeResponse(
+        encoded_data=encoded_data,
+        key=request.key,
+        huffman_codes=huffman_codes,
+        padding=padding
+    )
+
+def request_codes(request: DecodeRequest, codebook: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    if request.mode == MODE_STORED:
+        return {}
+    if request.code_lengths is not None:
+        return codes_from_header(request.code_lengths)
+    if codebook is not None:
+        return codebook
+    return request.huffman_codes or {}
+
+def decode_request(request: DecodeRequest, codebook: Optional[Dict[str, str]] = None) -> DecodeResponse:
+    huffman_codes = request_codes(request, codebook)
+    decoded_text = decode_data(request.encoded_data, request.key, huffman_codes, request.padding, request.mode or MODE_HUFFMAN)
+    return DecodeResponse(decoded_text=decoded_text)
+
+def encode_many(requests: List[EncodeRequest], codebooks: Dict[str, Dict[str, str]]) -> List[EncodeBatchItem]:
+    results = []
+    for request in requests:
+        try:
+            codebook = None
+            if request.codebook_id is not None:
+                if request.codebook_id not in codebooks:
+                    raise ValueError(f"Codebook {request.codebook_id} not found")
+                codebook = codebooks[request.codebook_id]
+            results.append(EncodeBatchItem(result=encode_request(request, codebook)))
+        except Exception as e:
+            results.append(EncodeBatchItem(error=f"Encoding failed: {str(e)}"))
+    return results
+
+def decode_many(requests: List[DecodeRequest], codebooks: Dict[str, Dict[str, str]]) -> List[DecodeBatchItem]:
+    results = []
+    for request in requests:
+        try:
+            codebook = None
+            if request.codebook_id is not None:
+                if request.codebook_id not in codebooks:
+                    raise ValueError(f"Codebook {request.codebook_id} not found")
+                codebook = codebooks[request.codebook_id]
+            results.append(DecodeBatchItem(result=decode_request(request, codebook)))
+        except Exception as e:
+            results.append(DecodeBatchItem(error=f"Decoding failed: {str(e)}"))
+    return results
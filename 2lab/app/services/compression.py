@@ -0,0 +1,110 @@
+import zlib
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Сжатие ответов по Accept-Encoding: brotli, если установлен пакет brotli, иначе
+# gzip. Сжимаются только JSON и текст не короче COMPRESSION_MIN_SIZE: бинарные
+# ответы /encode/raw и потоков — это уже сжатые и зашифрованные данные.
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+# Большие тела сжимаются в пуле потоков, чтобы не останавливать цикл событий
+COMPRESSION_THREAD_SIZE = 256 << 10
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self.compressor = brotli.Compressor(quality=settings.BROTLI_QUALITY)
+            self.finish = self.compressor.finish
+            self.compress = self.compressor.process
+        else:
+            # wbits=31 — формат gzip с заголовком и контрольной суммой
+            self.compressor = zlib.compressobj(settings.GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.finish = self.compressor.flush
+            self.compress = self.compressor.compress
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        return self.compress(data) + self.finish() if last else self.compress(data)
+
+class CompressionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                content_type = headers.get("content-type", "")
+                if (
+                    "content-encoding" in headers
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                    or (not more_body and len(body) < settings.COMPRESSION_MIN_SIZE)
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = await self.compress(compressor, body, True)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+            await send({"type": "http.response.body", "body": await self.compress(compressor, body, not more_body), "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    async def compress(compressor: _Compressor, body: bytes, last: bool) -> bytes:
+        if len(body) >= COMPRESSION_THREAD_SIZE:
+            return await run_in_threadpool(compressor.chunk, body, last)
+        return compressor.chunk(body, last)
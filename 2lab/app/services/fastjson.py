@@ -0,0 +1,31 @@
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson разбирает и собирает мегабайтные тела /encode и /decode в несколько раз
+# быстрее стандартного json. Без orjson всё работает как раньше.
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+class FastJSONRequest(Request):
+    async def json(self):
+        if not hasattr(self, "_json"):
+            # orjson.JSONDecodeError наследует json.JSONDecodeError, так что
+            # FastAPI по-прежнему отвечает 422 на битое тело
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+class FastJSONRoute(APIRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        if orjson is None:
+            return handler
+
+        async def route_handler(request: Request):
+            return await handler(FastJSONRequest(request.scope, request.receive))
+
+        return route_handler
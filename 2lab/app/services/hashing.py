@@ -0,0 +1,98 @@
+import asyncio
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+from fastapi import HTTPException, status
+from app.core.config import settings
+from app.services.pool import call_with_pool_async
+from app.services.security import get_password_hash, verify_password
+from app.services.metrics import HASH_QUEUE, STAGE_SECONDS
+
+# bcrypt считается в отдельном пуле процессов, чтобы всплеск логинов не занимал
+# пул потоков запросов. Число ожидающих задач ограничено HASH_QUEUE_SIZE:
+# при переполнении запрос сразу получает 503, а не ждёт в очереди.
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = 0
+_stats = {"completed": 0, "failed": 0, "rejected": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+
+def get_hash_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.HASH_WORKERS)
+    return _pool
+
+def discard_hash_pool(pool: ProcessPoolExecutor):
+    # Умерший процесс bcrypt ломает весь пул; следующий вызов создаст новый
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_hash_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
+
+def _retry_after() -> int:
+    # Время, за которое пул разберёт текущую очередь при средней задержке
+    average = _stats["total_seconds"] / _stats["completed"] if _stats["completed"] else 1.0
+    return max(1, math.ceil(_pending * average / settings.HASH_WORKERS))
+
+def _timed(func, *args):
+    # Выполняется в процессе пула: время bcrypt без ожидания в очереди
+    start = time.perf_counter()
+    return func(*args), time.perf_counter() - start
+
+async def _run(stage: str, func, *args):
+    global _pending
+    if _pending >= settings.HASH_QUEUE_SIZE:
+        _stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Password hashing queue is full",
+            headers={"Retry-After": str(_retry_after())},
+        )
+    _pending += 1
+    HASH_QUEUE.inc()
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        result, seconds = await call_with_pool_async(
+            lambda pool: loop.run_in_executor(pool, _timed, func, *args),
+            get_hash_pool, discard_hash_pool, "Password hashing pool is restarting",
+        )
+    except Exception:
+        # Ошибки и 503 не попадают в среднюю задержку, по которой считается Retry-After
+        _stats["failed"] += 1
+        raise
+    finally:
+        _pending -= 1
+        HASH_QUEUE.dec()
+    elapsed = time.perf_counter() - start
+    _stats["completed"] += 1
+    _stats["total_seconds"] += elapsed
+    _stats["max_seconds"] = max(_stats["max_seconds"], elapsed)
+    STAGE_SECONDS.observe(seconds, stage)
+    return result
+
+async def hash_password(password: str) -> str:
+    return await _run("bcrypt_hash", get_password_hash, password)
+
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    return await _run("bcrypt_verify", verify_password, plain_password, hashed_password)
+
+def hashing_stats() -> dict:
+    completed = _stats["completed"]
+    return {
+        "workers": settings.HASH_WORKERS,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "queue_size": settings.HASH_QUEUE_SIZE,
+        "queue_depth": _pending,
+        "completed": completed,
+        "failed": _stats["failed"],
+        "rejected": _stats["rejected"],
+        "avg_latency_ms": _stats["total_seconds"] / completed * 1000 if completed else 0.0,
+        "max_latency_ms": _stats["max_seconds"] * 1000,
+    }
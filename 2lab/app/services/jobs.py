@@ -0,0 +1,374 @@
+import argparse
+import multiprocessing
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.schemas.user import EncodeRequest, DecodeRequest
+from app.services.codebooks import registry
+from app.services.codec import encode_request, decode_request
+
+# Фоновые задачи кодирования. Брокер хранит задачи и их результаты, воркер
+# забирает задачу, выполняет её и сохраняет результат в виде готового JSON.
+#   memory — задачи живут в процессе API, их выполняет поток из этого же процесса,
+#            само кодирование уходит в общий пул процессов;
+#   sqlite — задачи лежат в JOB_DATABASE, их выполняют отдельные процессы
+#            python -m app.services.jobs.
+# Задача, упавшая с неожиданной ошибкой, повторяется с растущей задержкой до
+# JOB_MAX_ATTEMPTS раз; ошибка в данных (битые коды, неизвестный словарь) не повторяется.
+# Результаты и ошибки удаляются через JOB_RESULT_TTL секунд после завершения.
+# Ключ XOR хранится только в теле задачи, пока она не выполнена: из результата
+# /encode он вырезается, и клиент передаёт его заново в X-Key при получении.
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ERRORS = {"encode": "Encoding failed", "decode": "Decoding failed"}
+
+@dataclass
+class Job:
+    id: str
+    kind: str
+    status: str
+    created_at: float
+    attempts: int = 0
+    error: Optional[str] = None
+    expires_at: Optional[float] = None
+    payload: str = ""
+
+def run_job(kind: str, payload: str) -> str:
+    if kind == "encode":
+        request = EncodeRequest.model_validate_json(payload)
+        response = encode_request(request, job_codebook(request.codebook_id))
+        return response.model_dump_json(exclude_none=True, exclude={"key"})
+    request = DecodeRequest.model_validate_json(payload)
+    return decode_request(request, job_codebook(request.codebook_id)).model_dump_json()
+
+def job_codebook(codebook_id: Optional[str]) -> Optional[Dict[str, str]]:
+    if codebook_id is None:
+        return None
+    codes = registry.get(codebook_id)
+    if codes is None:
+        raise ValueError(f"Codebook {codebook_id} not found")
+    return codes
+
+class Broker(ABC):
+    def __init__(self):
+        self.max_attempts = settings.JOB_MAX_ATTEMPTS
+        self.result_ttl = settings.JOB_RESULT_TTL
+
+    def retry_at(self, attempts: int, now: float) -> float:
+        return now + settings.JOB_RETRY_DELAY * 2 ** (attempts - 1)
+
+    @abstractmethod
+    def submit(self, kind: str, payload: str) -> Job:
+        ...
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def result(self, job_id: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def claim(self) -> Optional[Job]:
+        ...
+
+    @abstractmethod
+    def complete(self, job: Job, result: str):
+        ...
+
+    @abstractmethod
+    def fail(self, job: Job, error: str, retry: bool):
+        ...
+
+    @abstractmethod
+    def purge(self) -> int:
+        ...
+
+    def wait(self, stop: threading.Event, timeout: float):
+        stop.wait(timeout)
+
+    def wake(self):
+        pass
+
+class MemoryBroker(Broker):
+    def __init__(self):
+        super().__init__()
+        self.jobs: Dict[str, Job] = {}
+        self.run_after: Dict[str, float] = {}
+        self.results: Dict[str, str] = {}
+        self.condition = threading.Condition()
+
+    def submit(self, kind: str, payload: str) -> Job:
+        now = time.time()
+        job = Job(id=uuid.uuid4().hex, kind=kind, status=QUEUED, created_at=now, payload=payload)
+        with self.condition:
+            self.jobs[job.id] = job
+            self.run_after[job.id] = now
+            self.condition.notify()
+        return replace(job, payload="")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None or (job.expires_at is not None and job.expires_at < time.time()):
+                return None
+            return replace(job, payload="")
+
+    def result(self, job_id: str) -> Optional[str]:
+        with self.condition:
+            return self.results.get(job_id)
+
+    def claim(self) -> Optional[Job]:
+        now = time.time()
+        with self.condition:
+            for job_id, run_after in self.run_after.items():
+                if run_after <= now:
+                    del self.run_after[job_id]
+                    job = self.jobs[job_id]
+                    job.status = RUNNING
+                    job.attempts += 1
+                    return replace(job)
+        return None
+
+    def complete(self, job: Job, result: str):
+        with self.condition:
+            stored = self.jobs.get(job.id)
+            if stored is None or stored.status != RUNNING:
+                return
+            self.results[job.id] = result
+            stored.status, stored.error, stored.payload = DONE, None, ""
+            stored.expires_at = time.time() + self.result_ttl
+
+    def fail(self, job: Job, error: str, retry: bool):
+        now = time.time()
+        with self.condition:
+            stored = self.jobs.get(job.id)
+            if stored is None or stored.status != RUNNING:
+                return
+            stored.error = error
+            if retry and stored.attempts < self.max_attempts:
+                stored.status = QUEUED
+                self.run_after[job.id] = self.retry_at(stored.attempts, now)
+            else:
+                stored.status, stored.payload, stored.expires_at = FAILED, "", now + self.result_ttl
+
+    def purge(self) -> int:
+        now = time.time()
+        with self.condition:
+            expired = [job.id for job in self.jobs.values() if job.expires_at is not None and job.expires_at < now]
+            for job_id in expired:
+                del self.jobs[job_id]
+                self.results.pop(job_id, None)
+        return len(expired)
+
+    def wait(self, stop: threading.Event, timeout: float):
+        with self.condition:
+            if not stop.is_set():
+                self.condition.wait(timeout)
+
+    def wake(self):
+        with self.condition:
+            self.condition.notify_all()
+
+class SQLiteBroker(Broker):
+    # Каждый запрос — отдельная транзакция (isolation_level=None), а захват задачи
+    # сделан одним UPDATE ... RETURNING, поэтому несколько воркеров не возьмут одну
+    # задачу дважды. Задача воркера, который упал, не завершив её, снова выдаётся
+    # после JOB_LEASE_TIMEOUT; результат старого воркера после этого не принимается.
+    COLUMNS = "id, kind, status, created_at, attempts, error, expires_at"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.local = threading.local()
+        self.connection().executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                run_after REAL NOT NULL,
+                lease_until REAL,
+                expires_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS ix_jobs_queue ON jobs (status, run_after);
+            CREATE INDEX IF NOT EXISTS ix_jobs_expires_at ON jobs (expires_at);
+            """
+        )
+
+    def connection(self) -> sqlite3.Connection:
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=settings.SQLITE_BUSY_TIMEOUT / 1000, isolation_level=None)
+            connection.execute(f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
+            connection.execute(f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}")
+            self.local.connection = connection
+        return connection
+
+    def submit(self, kind: str, payload: str) -> Job:
+        now = time.time()
+        job = Job(id=uuid.uuid4().hex, kind=kind, status=QUEUED, created_at=now)
+        self.connection().execute(
+            "INSERT INTO jobs (id, kind, payload, status, created_at, run_after) VALUES (?, ?, ?, ?, ?, ?)",
+            (job.id, kind, payload, QUEUED, now, now),
+        )
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self.connection().execute(
+            f"SELECT {self.COLUMNS} FROM jobs WHERE id = ? AND (expires_at IS NULL OR expires_at >= ?)",
+            (job_id, time.time()),
+        ).fetchone()
+        return Job(*row) if row is not None else None
+
+    def result(self, job_id: str) -> Optional[str]:
+        row = self.connection().execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def claim(self) -> Optional[Job]:
+        while True:
+            now = time.time()
+            row = self.connection().execute(
+                f"""
+                UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE (status = ? AND run_after <= ?) OR (status = ? AND lease_until < ?)
+                    ORDER BY run_after LIMIT 1
+                )
+                RETURNING {self.COLUMNS}, payload
+                """,
+                (RUNNING, now + settings.JOB_LEASE_TIMEOUT, QUEUED, now, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            job = Job(*row)
+            if job.attempts <= self.max_attempts:
+                return job
+            # Задачу уже выдавали максимальное число раз, и каждый раз воркер пропадал
+            self.fail(job, f"{ERRORS[job.kind]}: worker lost", retry=False)
+
+    def complete(self, job: Job, result: str):
+        self.connection().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = NULL, payload = '', lease_until = NULL, expires_at = ? "
+            "WHERE id = ? AND status = ? AND attempts = ?",
+            (DONE, result, time.time() + self.result_ttl, job.id, RUNNING, job.attempts),
+        )
+
+    def fail(self, job: Job, error: str, retry: bool):
+        now = time.time()
+        if retry and job.attempts < self.max_attempts:
+            self.connection().execute(
+                "UPDATE jobs SET status = ?, error = ?, run_after = ?, lease_until = NULL "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                (QUEUED, error, self.retry_at(job.attempts, now), job.id, RUNNING, job.attempts),
+            )
+        else:
+            self.connection().execute(
+                "UPDATE jobs SET status = ?, error = ?, payload = '', lease_until = NULL, expires_at = ? "
+                "WHERE id = ? AND status = ? AND attempts = ?",
+                (FAILED, error, now + self.result_ttl, job.id, RUNNING, job.attempts),
+            )
+
+    def purge(self) -> int:
+        return self.connection().execute("DELETE FROM jobs WHERE expires_at < ?", (time.time(),)).rowcount
+
+def work(broker: Broker, stop: threading.Event, execute=run_job, once: bool = False):
+    while not stop.is_set():
+        job = broker.claim()
+        if job is None:
+            if once:
+                return
+            broker.purge()
+            broker.wait(stop, settings.JOB_POLL_INTERVAL)
+            continue
+        try:
+            result = execute(job.kind, job.payload)
+        except (ValueError, KeyError) as e:
+            broker.fail(job, f"{ERRORS[job.kind]}: {str(e)}", retry=False)
+        except Exception as e:
+            broker.fail(job, f"{ERRORS[job.kind]}: {str(e)}", retry=True)
+        else:
+            broker.complete(job, result)
+
+_broker: Optional[Broker] = None
+_stop = threading.Event()
+_threads: List[threading.Thread] = []
+
+def run_in_pool(kind: str, payload: str) -> str:
+    from app.services.pool import call_with_pool
+    return call_with_pool(lambda pool: pool.submit(run_job, kind, payload).result())
+
+def get_broker() -> Broker:
+    global _broker
+    if _broker is None:
+        if settings.JOB_BROKER == "sqlite":
+            _broker = SQLiteBroker(settings.JOB_DATABASE)
+        elif settings.JOB_BROKER == "memory":
+            _broker = MemoryBroker()
+            _stop.clear()
+            for _ in range(settings.JOB_LOCAL_WORKERS):
+                thread = threading.Thread(target=work, args=(_broker, _stop, run_in_pool), daemon=True)
+                thread.start()
+                _threads.append(thread)
+        else:
+            raise ValueError(f"Unknown JOB_BROKER {settings.JOB_BROKER!r}")
+    return _broker
+
+def shutdown_job_broker():
+    global _broker
+    if _broker is None:
+        return
+    _stop.set()
+    _broker.wake()
+    for thread in _threads:
+        thread.join(timeout=5)
+    _threads.clear()
+    _broker = None
+
+def run_worker(once: bool = False):
+    broker = SQLiteBroker(settings.JOB_DATABASE)
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    try:
+        work(broker, stop, once=once)
+    except KeyboardInterrupt:
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background encode/decode workers for JOB_BROKER=sqlite")
+    parser.add_argument("--processes", type=int, default=settings.JOB_WORKER_PROCESSES)
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+    if settings.JOB_BROKER != "sqlite":
+        parser.error("worker processes need JOB_BROKER=sqlite, the memory broker runs jobs inside the API")
+
+    if args.processes == 1:
+        run_worker(args.once)
+        return
+    processes = [multiprocessing.Process(target=run_worker, args=(args.once,)) for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    # Воркеры дорабатывают текущую задачу и выходят
+    signal.signal(signal.SIGTERM, lambda signum, frame: [process.terminate() for process in processes])
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+if __name__ == "__main__":
+    main()
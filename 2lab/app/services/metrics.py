@@ -0,0 +1,166 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Tuple
+from sqlalchemy import event
+
+# Метрики в текстовом формате Prometheus без внешних зависимостей. Значения
+# хранятся по кортежу меток под одной блокировкой на метрику, так что запись
+# стоит один поиск в словаре; текст собирается только при запросе /metrics.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics: List["Metric"] = []
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], object] = {}
+        self.lock = threading.Lock()
+        _metrics.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value}")
+        return lines
+
+class CounterMetric(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+class GaugeMetric(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels: str):
+        # Счётчики по корзинам хранятся без накопления, суммы считаются при выводе
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            items = sorted((labels, (list(state[0]), state[1])) for labels, state in self.values.items())
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in _metrics for line in metric.render()) + "\n"
+
+REQUESTS = CounterMetric("http_requests_total", "HTTP requests by route and status code", ("method", "route", "status"))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+IN_FLIGHT = GaugeMetric("http_requests_in_flight", "HTTP requests being processed", ("method",))
+STAGE_SECONDS = Histogram("stage_duration_seconds", "Time spent in bcrypt, JWT and database stages", ("stage",))
+HASH_QUEUE = GaugeMetric("password_hash_queue_depth", "Password hashes submitted and not yet finished")
+CODEC_BYTES = CounterMetric("codec_bytes_total", "Input bytes processed by the codec", ("operation",))
+CODEC_SECONDS = CounterMetric("codec_seconds_total", "Time spent in the codec; bytes/s is the ratio of the two rates", ("operation",))
+RESULT_CACHE = CounterMetric("result_cache_requests_total", "Result cache lookups by outcome: memory_hit, disk_hit or miss", ("operation", "result"))
+RESULT_CACHE_BYTES = GaugeMetric("result_cache_bytes", "Size of cached responses by tier", ("tier",))
+
+@contextmanager
+def track_stage(stage: str):
+    start = time.perf_counter()
+    yield
+    STAGE_SECONDS.observe(time.perf_counter() - start, stage)
+
+@contextmanager
+def track_codec(operation: str, size: int):
+    # Учитываются только успешные вызовы
+    start = time.perf_counter()
+    yield
+    CODEC_SECONDS.inc(operation, amount=time.perf_counter() - start)
+    CODEC_BYTES.inc(operation, amount=size)
+
+def utf8_size(text: str) -> int:
+    return len(text) if text.isascii() else len(text.encode("utf-8"))
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Начало запоминается в контексте выполнения, а не в conn.info: контекст живёт
+    # одно выполнение, и упавший запрос ничего не оставляет на соединении из пула
+    if context is not None:
+        context.query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "query_start", None)
+    if start is not None:
+        STAGE_SECONDS.observe(time.perf_counter() - start, "db_query")
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+class MetricsMiddleware:
+    # ASGI-middleware без BaseHTTPMiddleware: не буферизует потоковые ответы.
+    # Маршрут берётся из шаблона пути (scope["route"]), а не из URL, чтобы число
+    # рядов меток не росло с числом разных путей. Шаблон известен только после
+    # маршрутизации, поэтому запросы в обработке считаются по методу.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc(method)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec(method)
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method, path)
+            REQUESTS.inc(method, path, str(status))
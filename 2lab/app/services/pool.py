@@ -0,0 +1,64 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from fastapi import HTTPException, status
+from app.core.config import settings
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    # Пул создаётся при первом обращении, чтобы импорт приложения не порождал процессы
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.ENCODE_WORKERS)
+    return _pool
+
+def discard_process_pool(pool: ProcessPoolExecutor):
+    # Пул, у которого умер процесс (например, от OOM), больше не принимает задачи;
+    # следующий get_process_pool создаст новый
+    global _pool
+    if _pool is pool:
+        _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def pool_unavailable(detail: str = "Worker pool is restarting") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": "1"},
+    )
+
+def call_with_pool(func, get_pool=get_process_pool, discard_pool=discard_process_pool, detail: str = "Worker pool is restarting"):
+    # func получает пул единственным аргументом. Если пул сломан, он пересоздаётся и
+    # вызов повторяется один раз; второй отказ — 503. get_pool и discard_pool
+    # позволяют применить то же к другому пулу процессов
+    pool = get_pool()
+    try:
+        return func(pool)
+    except BrokenProcessPool:
+        discard_pool(pool)
+    pool = get_pool()
+    try:
+        return func(pool)
+    except BrokenProcessPool:
+        discard_pool(pool)
+        raise pool_unavailable(detail)
+
+async def call_with_pool_async(func, get_pool=get_process_pool, discard_pool=discard_process_pool, detail: str = "Worker pool is restarting"):
+    pool = get_pool()
+    try:
+        return await func(pool)
+    except BrokenProcessPool:
+        discard_pool(pool)
+    pool = get_pool()
+    try:
+        return await func(pool)
+    except BrokenProcessPool:
+        discard_pool(pool)
+        raise pool_unavailable(detail)
+
+def shutdown_process_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+        _pool = None
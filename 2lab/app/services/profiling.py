@@ -0,0 +1,159 @@
+import cProfile
+import functools
+import os
+import pstats
+import random
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+from typing import List, Optional
+from urllib.parse import parse_qs
+from fastapi.concurrency import run_in_threadpool as _run_in_threadpool
+from app.core.config import settings
+from app.services.security import decode_token_subject, is_admin_email
+
+# Профилирование отдельного запроса. Включается заголовком X-Profile: 1 или
+# параметром ?profile=1 для администраторов (ADMIN_EMAILS) либо случайно с
+# вероятностью PROFILE_SAMPLE_RATE. Результат сохраняется в PROFILE_DIR как
+# <request id>.pstats, а самые горячие функции возвращаются в X-Profile-Top.
+#
+# До Python 3.12 cProfile видит только свой поток, поэтому синхронные
+# эндпоинты, которые FastAPI выполняет в пуле потоков, помечаются декоратором
+# profiled: он заводит отдельный профайлер в рабочем потоке, а результаты
+# объединяются. С 3.12 профайлер работает через sys.monitoring, видит все потоки
+# и второй активный профайлер запрещён, так что profiled ничего не делает.
+# В цикле событий одновременно профилируется не больше одного запроса;
+# корутины других запросов, выполнявшиеся в это время, тоже попадут в профиль.
+_profiles: ContextVar[Optional[List[cProfile.Profile]]] = ContextVar("profiles", default=None)
+_active = False
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+def profiled(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profiles = _profiles.get()
+        if profiles is None or not PER_THREAD_PROFILES:
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Уже работает другой профайлер или отладчик
+            return func(*args, **kwargs)
+        profiles.append(profile)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+    return wrapper
+
+async def run_in_threadpool(func, *args, **kwargs):
+    # fastapi.concurrency.run_in_threadpool, но с профилированием в рабочем потоке
+    return await _run_in_threadpool(profiled(func), *args, **kwargs)
+
+def _requested(scope, headers: dict) -> bool:
+    flag = headers.get(b"x-profile", b"").decode("latin-1")
+    if not flag:
+        flag = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile", [""])[0]
+    if flag.lower() not in ("1", "true", "yes"):
+        return False
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    if not authorization.lower().startswith("bearer "):
+        return False
+    from jose import JWTError
+    try:
+        email = decode_token_subject(authorization[7:])
+    except JWTError:
+        return False
+    return email is not None and is_admin_email(email)
+
+def top_functions(stats: pstats.Stats, limit: int) -> str:
+    # Функции с наибольшим собственным временем: "файл:строка(имя)=мс". Ожидание
+    # цикла событий в select (пока работают потоки) в заголовок не попадает
+    entries = [item for item in stats.stats.items() if "of 'select." not in item[0][2]]
+    entries = sorted(entries, key=lambda item: item[1][2], reverse=True)[:limit]
+    parts = []
+    for (filename, line, name), (_, _, own_time, _, _) in entries:
+        parts.append(f"{os.path.basename(filename)}:{line}({name})={own_time * 1000:.1f}ms")
+    return "; ".join(parts).encode("ascii", "replace").decode("ascii")
+
+def save_profiles(profiles: List[cProfile.Profile], request_id: str) -> str:
+    # Выполняется в пуле потоков: сборка статистики и запись файла не держат цикл событий
+    stats = pstats.Stats(profiles[0])
+    for extra in profiles[1:]:
+        stats.add(extra)
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    stats.dump_stats(os.path.join(settings.PROFILE_DIR, f"{request_id}.pstats"))
+    prune_profiles()
+    return top_functions(stats, settings.PROFILE_TOP)
+
+def prune_profiles():
+    # В каталоге остаются только PROFILE_MAX_FILES последних профилей
+    entries = []
+    for entry in os.scandir(settings.PROFILE_DIR):
+        if entry.name.endswith(".pstats"):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+    for _, path in sorted(entries)[:max(0, len(entries) - settings.PROFILE_MAX_FILES)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global _active
+        if scope["type"] != "http" or _active:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        explicit = _requested(scope, headers)
+        if not explicit and not (settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")
+        if not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            await self.app(scope, receive, send)
+            return
+        profiles = [profile]
+        token = _profiles.set(profiles)
+        finished = False
+
+        async def finish() -> str:
+            nonlocal finished
+            finished = True
+            profile.disable()
+            return await _run_in_threadpool(save_profiles, profiles, request_id)
+
+        async def send_wrapper(message):
+            # Профиль закрывается перед отправкой заголовков ответа; тело
+            # потоковых ответов, которое генерируется позже, в него не попадает
+            if message["type"] == "http.response.start" and not finished:
+                top = await finish()
+                extra = [(b"x-request-id", request_id.encode("latin-1"))]
+                if explicit:
+                    extra.append((b"x-profile-top", top.encode("latin-1")))
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+
+        _active = True
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not finished:
+                await finish()
+            _profiles.reset(token)
+            _active = False
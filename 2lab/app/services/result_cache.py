@@ -0,0 +1,143 @@
+import hashlib
+import hmac
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+from pydantic import BaseModel
+from app.core.config import settings
+from app.services.metrics import RESULT_CACHE, RESULT_CACHE_BYTES
+
+# Кэш готовых JSON-ответов /encode и /decode. Ключ — HMAC-SHA256 от операции и
+# тела запроса на SECRET_KEY: ни текст, ни ключ XOR в ключе кэша не хранятся, и
+# по нему нельзя перебором проверить догадку о них. Поле key из ответа /encode
+# вырезается перед сохранением и подставляется из запроса при выдаче.
+# Память ограничена суммарным размером ответов (RESULT_CACHE_MEMORY_BYTES), старые
+# записи вытесняются первыми. Дисковый уровень включается RESULT_CACHE_DIR: записи
+# пишутся туда сразу и переживают перезапуск, размер каталога ограничен
+# RESULT_CACHE_DISK_BYTES. Ответы /decode — это исходные тексты, поэтому каталог
+# должен быть доступен только приложению.
+
+class ResultCache:
+    def __init__(self, secret: str, memory_bytes: int, directory: str = "", disk_bytes: int = 0):
+        self.secret = secret.encode("utf-8")
+        self.memory_bytes = memory_bytes
+        self.directory = directory if disk_bytes > 0 else ""
+        self.disk_bytes = disk_bytes
+        self.memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self.memory_size = 0
+        self.disk: "OrderedDict[str, int]" = OrderedDict()
+        self.disk_size = 0
+        self.lock = threading.Lock()
+        if self.directory:
+            self.scan()
+
+    def scan(self):
+        # Несколько процессов API с одним каталогом видят чужие записи только
+        # после перезапуска; удалённый другим процессом файл — это промах
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and len(entry.name) == 64:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        for _, name, size in sorted(entries):
+            self.disk[name] = size
+            self.disk_size += size
+        RESULT_CACHE_BYTES.inc("disk", amount=self.disk_size)
+        self.evict_disk()
+
+    def key(self, operation: str, request: BaseModel) -> str:
+        digest = hmac.new(self.secret, operation.encode("utf-8") + b"\0", hashlib.sha256)
+        digest.update(request.model_dump_json().encode("utf-8"))
+        return digest.hexdigest()
+
+    def get(self, operation: str, key: str) -> Optional[bytes]:
+        with self.lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.memory.move_to_end(key)
+                RESULT_CACHE.inc(operation, "memory_hit")
+                return value
+            on_disk = key in self.disk
+        if on_disk:
+            try:
+                with open(os.path.join(self.directory, key), "rb") as f:
+                    value = f.read()
+            except FileNotFoundError:
+                value = None
+            with self.lock:
+                if value is None:
+                    size = self.disk.pop(key, 0)
+                    self.disk_size -= size
+                elif key in self.disk:
+                    self.disk.move_to_end(key)
+            if value is None:
+                RESULT_CACHE_BYTES.dec("disk", amount=size)
+            else:
+                self.remember(key, value)
+                RESULT_CACHE.inc(operation, "disk_hit")
+                return value
+        RESULT_CACHE.inc(operation, "miss")
+        return None
+
+    def set(self, key: str, value: bytes):
+        self.remember(key, value)
+        if self.directory and len(value) <= self.disk_bytes:
+            self.store(key, value)
+
+    def remember(self, key: str, value: bytes):
+        # Запись больше четверти бюджета вытеснила бы почти весь кэш ради себя одной
+        if len(value) > self.memory_bytes // 4:
+            return
+        with self.lock:
+            if key in self.memory:
+                return
+            self.memory[key] = value
+            self.memory_size += len(value)
+            delta = len(value)
+            while self.memory_size > self.memory_bytes:
+                _, old = self.memory.popitem(last=False)
+                self.memory_size -= len(old)
+                delta -= len(old)
+        RESULT_CACHE_BYTES.inc("memory", amount=delta)
+
+    def store(self, key: str, value: bytes):
+        with self.lock:
+            if key in self.disk:
+                return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, key)
+        temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(value)
+        os.replace(temporary, path)
+        with self.lock:
+            self.disk[key] = len(value)
+            self.disk_size += len(value)
+        RESULT_CACHE_BYTES.inc("disk", amount=len(value))
+        self.evict_disk()
+
+    def evict_disk(self):
+        removed = []
+        with self.lock:
+            while self.disk_size > self.disk_bytes:
+                name, size = self.disk.popitem(last=False)
+                self.disk_size -= size
+                removed.append((name, size))
+        for name, size in removed:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            RESULT_CACHE_BYTES.dec("disk", amount=size)
+
+def with_key(body: bytes, key: str) -> bytes:
+    # {"encoded_data": ...} -> {"key": ..., "encoded_data": ...}
+    return b'{"key":' + json.dumps(key, ensure_ascii=False).encode("utf-8") + b"," + body[1:]
+
+result_cache = ResultCache(
+    settings.SECRET_KEY, settings.RESULT_CACHE_MEMORY_BYTES, settings.RESULT_CACHE_DIR, settings.RESULT_CACHE_DISK_BYTES
+)
@@ -1,20 +1,45 @@
-from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.db import get_db
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.db import get_async_read_db
 from app.models.user import User
 from app.core.config import settings
-import bcrypt
+from app.services.cache import TTLCache
+from app.services.metrics import track_stage
+import time
+
+# jose (вместе с cryptography) и bcrypt импортируются при первом использовании:
+# это заметная часть времени запуска процесса, а в воркерах пула хэширования
+# jose не нужен вовсе
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login/")
 
+# Пользователи по subject токена (email) и subject уже проверенных токенов.
+# Токен хранится до своего exp, так что повторная проверка подписи не нужна.
+user_cache = TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+token_cache = TTLCache(settings.TOKEN_CACHE_SIZE)
+
+def invalidate_user(email: str):
+    user_cache.pop(email)
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    # При смене email сбрасываем и старую запись
+    invalidate_user(target.email)
+    for email in inspect(target).attrs.email.history.deleted:
+        invalidate_user(email)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
+    import bcrypt
     return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
 
 def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    import bcrypt
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=settings.BCRYPT_ROUNDS)).decode("utf-8")
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
@@ -23,24 +48,53 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
     to_encode.update({"exp": expire})
+    from jose import jwt
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def decode_token_subject(token: str) -> Optional[str]:
+    email = token_cache.get(token)
+    if email is not None:
+        return email
+    from jose import jwt
+    with track_stage("jwt_decode"):
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    email = payload.get("sub")
+    if email is not None and payload.get("exp") is not None:
+        token_cache.set(token, email, ttl=payload["exp"] - time.time())
+    return email
+
+def is_admin_email(email: str) -> bool:
+    return email in {admin.strip() for admin in settings.ADMIN_EMAILS.split(",") if admin.strip()}
+
+def is_admin(user: User) -> bool:
+    return is_admin_email(user.email)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_read_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    from jose import JWTError
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
+        email = decode_token_subject(token)
         if email is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    from app.cruds.user import get_user_by_email  # Ленивый импорт
-    user = get_user_by_email(db, email=email)
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+    from app.cruds.user import get_user_by_email_async  # Ленивый импорт
+    user = await get_user_by_email_async(db, email=email)
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    # Сессия закрывается после запроса, в кэше остаётся отсоединённый объект
+    user_cache.set(email, user)
+    return user
+
+async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    if not is_admin(current_user):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return current_user
@@ -0,0 +1,34 @@
+import tempfile
+from collections import Counter
+from typing import AsyncIterator, BinaryIO, Iterator, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.core.config import settings
+
+def _spool_chunk(spool: BinaryIO, freq: Counter, chunk: bytes):
+    spool.write(chunk)
+    freq.update(chunk)
+
+async def spool_upload(stream: AsyncIterator[bytes]) -> Tuple[BinaryIO, Counter]:
+    # Первый проход потокового кодирования: тело запроса сохраняется во временный
+    # файл (в памяти до STREAM_SPOOL_MEMORY, дальше на диске) и попутно считаются частоты
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.STREAM_SPOOL_MEMORY)
+    freq = Counter()
+    try:
+        async for chunk in stream:
+            if chunk:
+                await run_in_threadpool(_spool_chunk, spool, freq, chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool, freq
+
+def iter_spool(spool: BinaryIO) -> Iterator[bytes]:
+    try:
+        while True:
+            chunk = spool.read(settings.STREAM_CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+    finally:
+        spool.close()
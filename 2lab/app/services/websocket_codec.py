@@ -0,0 +1,126 @@
+from fastapi import WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from app.core.config import settings
+from app.schemas.user import EncodeRequest, DecodeRequest
+from app.services.codebooks import registry
+from app.services.codec import encode_response, request_codes
+from app.services.encoding import ChunkedEncoder, ChunkedDecoder, MODE_HUFFMAN
+
+# Протокол /ws/encode и /ws/decode. Клиент шлёт JSON-сообщения:
+#   {"key": ..., ...}   — параметры, как у EncodeRequest/DecodeRequest без text/encoded_data
+#   {"data": "..."}     — очередной кусок текста или encoded_data
+#   {"end": true}       — конец данных
+# Сервер отвечает сообщениями {"type": "progress", "phase", "processed"[, "total"]},
+# {"type": "data", "data"} с кусками результата, в конце {"type": "done", ...}
+# с остальными полями ответа, а при ошибке {"type": "error", "detail"}.
+#
+# Противодавление: следующий кусок результата считается только после того, как
+# предыдущий ушёл в сокет (send ждёт, пока сервер разгрузит буфер записи), а
+# следующее сообщение клиента читается только после отправки ответа на текущее.
+# Кодированию нужны два прохода, поэтому текст целиком хранится в памяти,
+# не больше WS_MAX_TEXT_SIZE байт.
+
+class ProtocolError(ValueError):
+    pass
+
+async def _receive_data(websocket: WebSocket):
+    message = await websocket.receive_json()
+    if not isinstance(message, dict):
+        raise ProtocolError("Expected a JSON object")
+    if message.get("end"):
+        return None
+    data = message.get("data")
+    if not isinstance(data, str):
+        raise ProtocolError("Expected {\"data\": <string>} or {\"end\": true}")
+    return data
+
+async def _receive_start(websocket: WebSocket) -> dict:
+    message = await websocket.receive_json()
+    if not isinstance(message, dict):
+        raise ProtocolError("Expected a JSON object")
+    if "text" in message or "encoded_data" in message:
+        raise ProtocolError("Data is sent in {\"data\": ...} messages, not in the start message")
+    return message
+
+async def _send_progress(websocket: WebSocket, phase: str, processed: int, total=None):
+    message = {"type": "progress", "phase": phase, "processed": processed}
+    if total is not None:
+        message["total"] = total
+    await websocket.send_json(message)
+
+async def _run_session(websocket: WebSocket, session):
+    await websocket.accept()
+    try:
+        await session(websocket)
+    except WebSocketDisconnect:
+        return
+    except (ValueError, TypeError, ValidationError) as e:
+        # ProtocolError и ошибки pydantic — тоже ValueError; TypeError — сообщение не той формы
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.close()
+
+async def _encode(websocket: WebSocket):
+    request = EncodeRequest.model_validate({**await _receive_start(websocket), "text": ""})
+    codebook = None
+    if request.codebook_id is not None:
+        codebook = registry.get(request.codebook_id)
+        if codebook is None:
+            raise ProtocolError(f"Codebook {request.codebook_id} not found")
+    encoder = ChunkedEncoder(request.key, request.canonical, settings.STREAM_CHUNK_SIZE)
+
+    while (data := await _receive_data(websocket)) is not None:
+        await run_in_threadpool(encoder.add, data)
+        if encoder.size > settings.WS_MAX_TEXT_SIZE:
+            raise ProtocolError(f"Text is limited to {settings.WS_MAX_TEXT_SIZE} bytes")
+        await _send_progress(websocket, "frequency", encoder.size)
+
+    # Словарь из реестра используется, только если покрывает все символы текста
+    from_codebook = codebook is not None and codebook.keys() >= encoder.freq.keys()
+    await run_in_threadpool(encoder.prepare, codebook if from_codebook else None)
+    await _send_progress(websocket, "tree", encoder.size, encoder.size)
+
+    steps = encoder.encode()
+    while (step := await run_in_threadpool(next, steps, None)) is not None:
+        phase, processed, piece = step
+        await _send_progress(websocket, phase, processed, encoder.size)
+        if piece:
+            await websocket.send_json({"type": "data", "data": piece})
+
+    response = encode_response(request, "", encoder.codes, encoder.padding, encoder.mode, from_codebook)
+    result = response.model_dump(exclude_none=True, exclude={"encoded_data"})
+    await websocket.send_json({"type": "done", **result})
+
+async def _decode(websocket: WebSocket):
+    request = DecodeRequest.model_validate({**await _receive_start(websocket), "encoded_data": ""})
+    codebook = None
+    if request.codebook_id is not None and request.code_lengths is None:
+        codebook = registry.get(request.codebook_id)
+        if codebook is None:
+            raise ProtocolError(f"Codebook {request.codebook_id} not found")
+    codes = request_codes(request, codebook)
+    decoder = ChunkedDecoder(request.key, codes, request.padding, request.mode or MODE_HUFFMAN)
+
+    processed = 0
+    while True:
+        data = await _receive_data(websocket)
+        last = data is None
+        data = data or ""
+        processed += len(data)
+        steps = decoder.feed(data, last)
+        while (step := await run_in_threadpool(next, steps, None)) is not None:
+            phase, piece = step
+            await _send_progress(websocket, phase, processed)
+            if piece:
+                await websocket.send_json({"type": "data", "data": piece})
+        if last:
+            break
+    await websocket.send_json({"type": "done"})
+
+async def encode_session(websocket: WebSocket):
+    await _run_session(websocket, _encode)
+
+async def decode_session(websocket: WebSocket):
+    await _run_session(websocket, _decode)
@@ -0,0 +1,148 @@
+"""Бенчмарк сервиса кодирования.
+
+Запуск из каталога 2lab:
+
+    python -m benchmarks.bench_encoding                      # 1 КБ .. 1 МБ
+    python -m benchmarks.bench_encoding --full               # 1 КБ .. 100 МБ
+    python -m benchmarks.bench_encoding --save baseline.json
+    python -m benchmarks.bench_encoding --compare baseline.json --threshold 0.2
+
+Для каждой операции (huffman_encode, huffman_decode, xor_encrypt и полный
+круг /encode + /decode через TestClient), размера входа, алфавита (ASCII или
+CJK) и энтропии (низкая или высокая) печатается пропускная способность в
+МБ/с исходного текста, пиковая память по tracemalloc и отношение размера
+результата ко входу. С --compare скрипт завершается с кодом 1, если
+пропускная способность упала или пиковая память выросла больше порога.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from app.services.encoding import huffman_encode, huffman_decode, xor_encrypt
+
+SIZES = [1 << 10, 64 << 10, 1 << 20]
+FULL_SIZES = SIZES + [10 << 20, 100 << 20]
+ALPHABETS = {
+    "ascii": [chr(c) for c in range(32, 127)],
+    "unicode": [chr(c) for c in range(0x4E00, 0x4E00 + 20000)],
+}
+# Текст генерируется кусками этого размера и повторяется до нужной длины:
+# частоты символов при этом не меняются
+SAMPLE_CHARS = 1 << 18
+# Полный круг через HTTP-слой на самых больших входах занимает минуты
+API_MAX_SIZE = 10 << 20
+KEY = "benchmark-key"
+
+def make_text(size: int, alphabet: str, entropy: str, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    symbols = ALPHABETS[alphabet]
+    if entropy == "low":
+        # Геометрическое распределение: несколько символов покрывают почти весь текст
+        weights = [0.5 ** min(i, 60) for i in range(len(symbols))]
+    else:
+        weights = None
+    chars = size // len(symbols[0].encode("utf-8"))
+    sample = "".join(rng.choices(symbols, weights=weights, k=min(chars, SAMPLE_CHARS)))
+    return (sample * (chars // len(sample) + 1))[:chars]
+
+def measure(func, repeats: int):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, best, peak
+
+def api_client():
+    from fastapi.testclient import TestClient
+    from main import app
+    from app.services.result_cache import result_cache
+    # Замер повторяет один и тот же запрос: без этого меряются попадания в кэш
+    # результатов, а не кодек
+    result_cache.memory_bytes = 0
+    result_cache.directory = ""
+    return TestClient(app)
+
+def run_case(size: int, alphabet: str, entropy: str, client) -> list:
+    text = make_text(size, alphabet, entropy)
+    input_size = len(text.encode("utf-8"))
+    repeats = 5 if size <= 64 << 10 else 1
+    encoded, codes, padding = huffman_encode(text)
+    operations = [
+        ("huffman_encode", lambda: huffman_encode(text), lambda r: len(r[0])),
+        ("huffman_decode", lambda: huffman_decode(encoded, codes, padding), lambda r: len(r.encode("utf-8"))),
+        ("xor_encrypt", lambda: xor_encrypt(encoded, KEY), len),
+    ]
+    if client is not None and size <= API_MAX_SIZE:
+        def round_trip():
+            response = client.post("/encode", json={"text": text, "key": KEY})
+            body = response.json()
+            decoded = client.post("/decode", json=body).json()["decoded_text"]
+            assert decoded == text
+            return len(response.content)
+        operations.append(("api_round_trip", round_trip, lambda r: r))
+    results = []
+    for name, func, output_size in operations:
+        result, seconds, peak = measure(func, repeats)
+        results.append({
+            "case": f"{name}/{alphabet}/{entropy}/{size}",
+            "throughput_mb_s": input_size / seconds / 1e6,
+            "peak_memory_mb": peak / 1e6,
+            "output_ratio": output_size(result) / input_size,
+        })
+    return results
+
+def compare(results: list, baseline_path: str, threshold: float) -> list:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {item["case"]: item for item in json.load(f)["results"]}
+    regressions = []
+    for item in results:
+        base = baseline.get(item["case"])
+        if base is None:
+            continue
+        if item["throughput_mb_s"] < base["throughput_mb_s"] * (1 - threshold):
+            regressions.append(f"{item['case']}: throughput {base['throughput_mb_s']:.2f} -> {item['throughput_mb_s']:.2f} MB/s")
+        if item["peak_memory_mb"] > base["peak_memory_mb"] * (1 + threshold) + 0.1:
+            regressions.append(f"{item['case']}: peak memory {base['peak_memory_mb']:.2f} -> {item['peak_memory_mb']:.2f} MB")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Encoding service benchmarks")
+    parser.add_argument("--full", action="store_true", help="include 10 MB and 100 MB inputs")
+    parser.add_argument("--no-api", action="store_true", help="skip the /encode + /decode round trip")
+    parser.add_argument("--filter", default="", help="run only cases containing this substring")
+    parser.add_argument("--save", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    client = None if args.no_api else api_client()
+    results = []
+    print(f"{'case':<42} {'MB/s':>9} {'peak MB':>9} {'ratio':>7}")
+    for size in FULL_SIZES if args.full else SIZES:
+        for alphabet in ALPHABETS:
+            for entropy in ("low", "high"):
+                if args.filter and args.filter not in f"{alphabet}/{entropy}/{size}":
+                    continue
+                for item in run_case(size, alphabet, entropy, client):
+                    results.append(item)
+                    print(f"{item['case']:<42} {item['throughput_mb_s']:>9.2f} {item['peak_memory_mb']:>9.2f} {item['output_ratio']:>7.3f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "results": results}, f, indent=2)
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for line in regressions:
+            print("REGRESSION", line)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""Нагрузочный тест API авторизации и кодирования.
+
+Запуск из каталога 2lab:
+
+    python -m benchmarks.bench_load
+    python -m benchmarks.bench_load --scenario auth --concurrency 64 --duration 30
+    python -m benchmarks.bench_load --mix login=5,me=10,encode=1 --text-size 65536
+    python -m benchmarks.bench_load --url http://127.0.0.1:8000 --compare benchmarks/results/old.json
+
+Без --url поднимается uvicorn на свободном порту, его база — копия app.db во
+временном каталоге. Сначала регистрируются --users пользователей, затем
+--concurrency виртуальных клиентов в течение --duration секунд выбирают
+операцию по весам сценария и шлют запросы через один httpx.AsyncClient с пулом
+соединений. Для каждого маршрута печатаются число запросов, ошибки, запросы в
+секунду и задержки p50/p95/p99. Итог сохраняется в JSON вместе с коммитом, чтобы
+сравнивать прогоны между коммитами (--compare).
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+SCENARIOS = {
+    "mixed": {"sign_up": 1, "login": 3, "me": 6, "encode": 2},
+    "auth": {"sign_up": 1, "login": 4, "me": 5},
+    "encode": {"encode": 1},
+}
+PASSWORD = "load-test-password"
+ALPHABET = "abcdefghijklmnopqrstuvwxyz     .,абвгдежзиклмнопрст"
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS["mixed"]:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentile(values: list, fraction: float) -> float:
+    # Ближайший ранг по отсортированному списку: ceil(p * n)-й элемент.
+    # round убирает ошибку float, иначе 0.07 * 100 = 7.000000000000001 даёт 8-й
+    index = min(len(values) - 1, max(0, math.ceil(round(fraction * len(values), 9)) - 1))
+    return values[index]
+
+def git_commit() -> dict:
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"], text=True).strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(workdir: str, workers: int, bcrypt_rounds: int):
+    path = os.path.join(workdir, "app.db")
+    shutil.copy("app.db", path)
+    port = free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.getcwd(),
+        DATABASE_URL=f"sqlite:///{path}",
+        ASYNC_DATABASE_URL=f"sqlite+aiosqlite:///{path}",
+        CODEBOOK_DIR=os.path.join(workdir, "codebooks"),
+        PROFILE_DIR=os.path.join(workdir, "profiles"),
+        BCRYPT_ROUNDS=str(bcrypt_rounds),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=env,
+    )
+    return server, f"http://127.0.0.1:{port}"
+
+async def wait_ready(client, server, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"server exited with code {server.returncode}")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start in time")
+
+async def sign_up(client, email: str):
+    return await client.post("/sign-up/", json={"email": email, "password": PASSWORD})
+
+async def run_load(args, base_url: str, server=None) -> dict:
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        await wait_ready(client, server)
+
+        # Учётные записи для login и /users/me/ создаются до замера
+        accounts = []
+        for _ in range(args.users):
+            email = f"load-{uuid.uuid4().hex}@example.com"
+            response = await sign_up(client, email)
+            response.raise_for_status()
+            accounts.append((email, response.json()["token"]))
+
+        rng = random.Random(args.seed)
+        texts = ["".join(rng.choices(ALPHABET, k=args.text_size)) for _ in range(16)]
+        names = list(args.mix)
+        weights = [args.mix[name] for name in names]
+        samples = {name: [] for name in names}
+        errors = {name: 0 for name in names}
+        counter = 0
+
+        async def operation(name: str, worker_rng: random.Random):
+            nonlocal counter
+            counter += 1
+            email, token = worker_rng.choice(accounts)
+            if name == "sign_up":
+                return await sign_up(client, f"load-{uuid.uuid4().hex}@example.com")
+            if name == "login":
+                return await client.post("/login/", data={"username": email, "password": PASSWORD})
+            if name == "me":
+                return await client.get("/users/me/", headers={"Authorization": f"Bearer {token}"})
+            # Номер запроса в конце текста, чтобы не попадать в кэш результатов
+            text = worker_rng.choice(texts) + str(counter)
+            return await client.post("/encode", json={"text": text, "key": "load-test-key"})
+
+        async def virtual_user(index: int, deadline: float):
+            worker_rng = random.Random(args.seed * 1000 + index)
+            while time.perf_counter() < deadline:
+                name = worker_rng.choices(names, weights)[0]
+                start = time.perf_counter()
+                try:
+                    response = await operation(name, worker_rng)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                elapsed = time.perf_counter() - start
+                if failed:
+                    errors[name] += 1
+                else:
+                    samples[name].append(elapsed)
+
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(virtual_user(index, deadline) for index in range(args.concurrency)))
+        elapsed = time.perf_counter() - start
+
+    routes = {}
+    for name in names:
+        latencies = sorted(samples[name])
+        routes[name] = {
+            "requests": len(latencies),
+            "errors": errors[name],
+            "rps": len(latencies) / elapsed,
+        }
+        if latencies:
+            routes[name].update({
+                "mean_ms": sum(latencies) / len(latencies) * 1000,
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p95_ms": percentile(latencies, 0.95) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+            })
+    total = sum(route["requests"] for route in routes.values())
+    return {"elapsed_s": elapsed, "total_requests": total, "total_rps": total / elapsed, "routes": routes}
+
+def print_report(result: dict, baseline: dict = None):
+    print(f"{'route':<8} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, route in result["routes"].items():
+        print(
+            f"{name:<8} {route['requests']:>9} {route['errors']:>7} {route['rps']:>8.1f} "
+            f"{route.get('p50_ms', 0):>8.1f} {route.get('p95_ms', 0):>8.1f} {route.get('p99_ms', 0):>8.1f}"
+        )
+    print(f"{'total':<8} {result['total_requests']:>9} {'':>7} {result['total_rps']:>8.1f}")
+    if baseline is None:
+        return
+    print(f"\nrelative to {baseline.get('commit') or 'baseline'} (new / old)")
+    print(f"{'route':<8} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, route in result["routes"].items():
+        old = baseline["result"]["routes"].get(name)
+        if not old:
+            continue
+        ratios = [route.get(key, 0) / old[key] if old.get(key) else float("nan") for key in ("rps", "p50_ms", "p95_ms", "p99_ms")]
+        print(f"{name:<8} " + " ".join(f"{ratio:>8.2f}" for ratio in ratios))
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the auth and encoding API")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--mix", type=parse_mix, help="operation weights, e.g. sign_up=1,login=3,me=6,encode=2")
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual users")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load after setup")
+    parser.add_argument("--users", type=int, default=20, help="accounts created before the run")
+    parser.add_argument("--text-size", type=int, default=4096, help="characters per /encode request")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--url", help="test an already running server instead of starting one")
+    parser.add_argument("--server-workers", type=int, default=1)
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="BCRYPT_ROUNDS of the started server")
+    parser.add_argument("--output", help="result file, defaults to benchmarks/results/load-<commit>-<time>.json")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+    args.mix = args.mix or SCENARIOS[args.scenario]
+
+    server = None
+    workdir = None
+    if args.url:
+        base_url = args.url
+    else:
+        workdir = tempfile.mkdtemp(prefix="bench-load-")
+        server, base_url = start_server(workdir, args.server_workers, args.bcrypt_rounds)
+    try:
+        result = asyncio.run(run_load(args, base_url, server))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    now = datetime.now(timezone.utc)
+    report = {
+        **git_commit(),
+        "timestamp": now.isoformat(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "options": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "result": result,
+    }
+    output = args.output
+    if output is None:
+        commit = (report["commit"] or "unknown")[:10]
+        output = os.path.join("benchmarks", "results", f"load-{commit}-{now:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nsaved {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Бенчмарк пропускной способности /login/ при параллельной регистрации.
+
+Запуск из каталога 2lab:
+
+    python -m benchmarks.bench_login
+    python -m benchmarks.bench_login --logins 2000 --concurrency 64 --writers 4
+
+Каждый профиль запускается в отдельном процессе на свежей копии базы:
+"baseline" повторяет прежнее подключение (журнал отката, synchronous=FULL,
+без mmap, без пула соединений только для чтения), "tuned" — настройки по
+умолчанию из Settings. Стоимость bcrypt снижена до минимальной, а кэши
+пользователей отключены, чтобы в замере оставалась в основном работа с базой.
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+PROFILES = {
+    "baseline": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_CACHE_SIZE": "-2000",
+        "DB_READ_ONLY_POOL": "false",
+    },
+    "tuned": {},
+}
+COMMON = {"BCRYPT_ROUNDS": "4", "USER_CACHE_SIZE": "0", "TOKEN_CACHE_SIZE": "0", "HASH_QUEUE_SIZE": "100000"}
+PASSWORD = "benchmark-password"
+
+async def run(logins: int, concurrency: int, writers: int, users: int) -> dict:
+    import httpx
+    from main import app
+    from app.db import SessionLocal, init_db
+    from app.cruds.user import create_user
+
+    init_db()
+    db = SessionLocal()
+    emails = [f"bench-{uuid.uuid4().hex}@example.com" for _ in range(users)]
+    for email in emails:
+        create_user(db, email=email, password=PASSWORD)
+    db.close()
+
+    latencies = []
+    stop = asyncio.Event()
+    signups = 0
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def writer():
+            nonlocal signups
+            while not stop.is_set():
+                email = f"bench-{uuid.uuid4().hex}@example.com"
+                response = await client.post("/sign-up/", json={"email": email, "password": PASSWORD})
+                signups += response.status_code == 200
+
+        async def reader(queue: asyncio.Queue):
+            while not queue.empty():
+                email = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post("/login/", data={"username": email, "password": PASSWORD})
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise RuntimeError(f"login failed: {response.status_code} {response.text}")
+
+        queue = asyncio.Queue()
+        for i in range(logins):
+            queue.put_nowait(emails[i % users])
+        writer_tasks = [asyncio.create_task(writer()) for _ in range(writers)]
+        start = time.perf_counter()
+        await asyncio.gather(*(reader(queue) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await asyncio.gather(*writer_tasks)
+
+    latencies.sort()
+    return {
+        "logins_per_s": logins / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "signups": signups,
+    }
+
+def run_profile(name: str, args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench-login-")
+    try:
+        path = os.path.join(workdir, "app.db")
+        shutil.copy("app.db", path)
+        env = dict(os.environ, **COMMON, **PROFILES[name])
+        env["DATABASE_URL"] = f"sqlite:///{path}"
+        env["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+        output = subprocess.check_output(
+            [sys.executable, "-m", "benchmarks.bench_login", "--child",
+             "--logins", str(args.logins), "--concurrency", str(args.concurrency),
+             "--writers", str(args.writers), "--users", str(args.users)],
+            env=env,
+        )
+        return json.loads(output.decode().strip().splitlines()[-1])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent login throughput benchmark")
+    parser.add_argument("--logins", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--writers", type=int, default=2, help="concurrent sign-up loops running during the test")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(run(args.logins, args.concurrency, args.writers, args.users))))
+        return
+    print(f"{'profile':<10} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'sign-ups':>9}")
+    results = {}
+    for name in PROFILES:
+        results[name] = item = run_profile(name, args)
+        print(f"{name:<10} {item['logins_per_s']:>9.1f} {item['p50_ms']:>8.1f} {item['p95_ms']:>8.1f} {item['signups']:>9}")
+    print(f"speedup: {results['tuned']['logins_per_s'] / results['baseline']['logins_per_s']:.2f}x")
+
+if __name__ == "__main__":
+    main()
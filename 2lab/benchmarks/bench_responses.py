@@ -0,0 +1,100 @@
+"""Бенчмарк сериализации и сжатия больших ответов /encode и /decode.
+
+Запуск из каталога 2lab:
+
+    python -m benchmarks.bench_responses
+    python -m benchmarks.bench_responses --sizes 1048576 10485760
+
+Для каждого размера и алфавита печатается время разбора тела запроса и сборки
+ответа стандартным json и orjson, а также размер ответа и время сжатия gzip на
+разных уровнях (и brotli, если установлен). Последние столбцы — полный круг
+/encode + /decode через TestClient без сжатия и с Accept-Encoding: gzip.
+"""
+import argparse
+import json
+import time
+import zlib
+from app.schemas.user import EncodeRequest, DecodeRequest
+from app.services.codec import encode_request, decode_request
+from benchmarks.bench_encoding import api_client, make_text
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+KEY = "benchmark-key"
+
+def best_ms(func, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def stdlib_dumps(content) -> bytes:
+    # Как starlette.responses.JSONResponse.render
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def serialization_rows(text: str) -> list:
+    request_body = stdlib_dumps({"text": text, "key": KEY})
+    encoded = encode_request(EncodeRequest(text=text, key=KEY))
+    payloads = {
+        "encode": encoded.model_dump(mode="json", exclude_none=True),
+        "decode": decode_request(DecodeRequest(**encoded.model_dump())).model_dump(mode="json"),
+    }
+    rows = [("request json.loads", best_ms(lambda: json.loads(request_body)), len(request_body))]
+    if orjson is not None:
+        rows.append(("request orjson.loads", best_ms(lambda: orjson.loads(request_body)), len(request_body)))
+    for name, content in payloads.items():
+        body = stdlib_dumps(content)
+        rows.append((f"{name} json.dumps", best_ms(lambda: stdlib_dumps(content)), len(body)))
+        if orjson is not None:
+            rows.append((f"{name} orjson.dumps", best_ms(lambda: orjson.dumps(content)), len(body)))
+        for level in (1, 6, 9):
+            compressed = zlib.compress(body, level)
+            rows.append((f"{name} gzip-{level}", best_ms(lambda: zlib.compress(body, level), 1), len(compressed)))
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=4)
+            rows.append((f"{name} brotli-4", best_ms(lambda: brotli.compress(body, quality=4), 1), len(compressed)))
+    return rows
+
+def api_round_trip(client, text: str, accept_encoding: str):
+    headers = {"Accept-Encoding": accept_encoding}
+    start = time.perf_counter()
+    response = client.post("/encode", json={"text": text, "key": KEY}, headers=headers)
+    decoded = client.post("/decode", content=response.content, headers={**headers, "Content-Type": "application/json"})
+    elapsed = time.perf_counter() - start
+    assert decoded.json()["decoded_text"] == text
+    # httpx распаковывает тело сам, размер на проводе берётся из Content-Length
+    wire = int(response.headers["content-length"]) + int(decoded.headers["content-length"])
+    return elapsed * 1000, wire
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization and compression benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1 << 20, 4 << 20])
+    parser.add_argument("--no-api", action="store_true", help="skip the TestClient round trip")
+    args = parser.parse_args()
+
+    client = None if args.no_api else api_client()
+
+    for size in args.sizes:
+        for alphabet in ("ascii", "unicode"):
+            text = make_text(size, alphabet, "high")
+            print(f"\n{alphabet} {size} bytes")
+            print(f"  {'step':<24} {'ms':>9} {'bytes':>11}")
+            for name, ms, length in serialization_rows(text):
+                print(f"  {name:<24} {ms:>9.1f} {length:>11}")
+            if client is not None:
+                for accept in ("identity", "gzip"):
+                    ms, wire = api_round_trip(client, text, accept)
+                    print(f"  {'api round trip ' + accept:<24} {ms:>9.1f} {wire:>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Время холодного запуска API.
+
+Запуск из каталога 2lab:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --top 25
+    python -m benchmarks.bench_startup --openapi openapi.json
+
+Каждый замер — отдельный процесс интерпретатора: время импорта main, время до
+ответа на первый запрос к / и к /openapi.json (запросы идут прямо в ASGI-
+приложение, без HTTP-клиента) и полное время жизни процесса. Печатаются
+медианы, а затем модули с наибольшим временем импорта по python -X importtime.
+С --openapi схема один раз сохраняется в файл и грузится через
+OPENAPI_SCHEMA_PATH.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CHILD = r"""
+import asyncio, json, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def call(path):
+    messages = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        messages.append(message)
+    scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "headers": [], "http_version": "1.1", "scheme": "http", "server": ("bench", 80),
+             "client": ("bench", 1), "root_path": "", "asgi": {"version": "3.0"}}
+    await main.app(scope, receive, send)
+    assert messages[0]["status"] == 200, messages[0]
+
+asyncio.run(call("/"))
+first = time.perf_counter()
+asyncio.run(call("/openapi.json"))
+openapi = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1000, "first_request_ms": (first - start) * 1000,
+                  "openapi_ms": (openapi - first) * 1000}))
+"""
+
+def measure(env: dict) -> dict:
+    start = time.perf_counter()
+    output = subprocess.check_output([sys.executable, "-c", CHILD], env=env)
+    result = json.loads(output.decode().strip().splitlines()[-1])
+    result["process_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+def import_report(env: dict, top: int) -> list:
+    # Строки "import time: self [us] | cumulative | imported package"
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], env=env, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), int(own), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="API cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20, help="modules to list in the import report")
+    parser.add_argument("--openapi", help="dump the OpenAPI schema to this path and load it from disk")
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    if args.openapi:
+        subprocess.check_call([sys.executable, "main.py", "--dump-openapi", args.openapi], env=env)
+        env["OPENAPI_SCHEMA_PATH"] = os.path.abspath(args.openapi)
+
+    runs = [measure(env) for _ in range(args.runs)]
+    for key in ("import_ms", "first_request_ms", "openapi_ms", "process_ms"):
+        print(f"{key:<18} {statistics.median(run[key] for run in runs):>9.1f}")
+
+    print(f"\n{'cumulative ms':>13} {'self ms':>8}  module")
+    for cumulative, own, name in import_report(env, args.top):
+        print(f"{cumulative / 1000:>13.1f} {own / 1000:>8.1f}  {name}")
+
+if __name__ == "__main__":
+    main()
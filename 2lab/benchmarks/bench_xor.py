@@ -0,0 +1,33 @@
+import os
+import time
+from app.services.encoding import xor_bytes
+
+SIZES = [1 << 10, 1 << 16, 1 << 20, 16 << 20]
+KEYS = [b"k", b"secret", os.urandom(1000)]
+REPEATS = 3
+
+def legacy_xor(data: bytes, key: bytes) -> bytes:
+    # Реализация до перехода на блочный XOR, для сравнения
+    return bytes(a ^ b for a, b in zip(data, key * (len(data) // len(key) + 1)))
+
+def best_time(func, *args) -> float:
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    print(f"{'size':>10} {'key':>5} {'legacy MB/s':>12} {'bulk MB/s':>10} {'speedup':>8}")
+    for size in SIZES:
+        data = os.urandom(size)
+        for key in KEYS:
+            if xor_bytes(data, key) != legacy_xor(data, key):
+                raise SystemExit(f"Mismatch for size={size} key_len={len(key)}")
+            legacy = best_time(legacy_xor, data, key)
+            bulk = best_time(xor_bytes, data, key)
+            print(f"{size:>10} {len(key):>5} {size / legacy / 1e6:>12.1f} {size / bulk / 1e6:>10.1f} {legacy / bulk:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,19 @@
 from fastapi import FastAPI, Depends
+import json
+import os
+import sys
+from fastapi.responses import PlainTextResponse
 from app.api import auth_router
+from app.services.pool import shutdown_process_pool
+from app.services.hashing import shutdown_hash_pool
+from app.services.jobs import shutdown_job_broker
+from app.db import async_engine, async_read_engine
+from app.services.metrics import MetricsMiddleware, render_metrics
+from app.services.profiling import ProfilingMiddleware
+from app.services.compression import CompressionMiddleware
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
+from app.core.config import settings
 
 app = FastAPI(
     title="User API",
@@ -17,15 +29,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
+# Добавляется последним, чтобы быть внешним и учитывать время всех остальных слоёв
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth_router)
 
+@app.on_event("shutdown")
+async def shutdown():
+    shutdown_job_broker()
+    shutdown_process_pool()
+    shutdown_hash_pool()
+    await async_engine.dispose()
+    await async_read_engine.dispose()
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the API, use this link http://127.0.0.1:8000/docs"}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
+    # Схема меняется только вместе с кодом, поэтому её можно собрать заранее
+    if settings.OPENAPI_SCHEMA_PATH and os.path.exists(settings.OPENAPI_SCHEMA_PATH):
+        with open(settings.OPENAPI_SCHEMA_PATH, encoding="utf-8") as f:
+            app.openapi_schema = json.load(f)
+        return app.openapi_schema
     openapi_schema = get_openapi(
         title="User API",
         version="1.0.0",
@@ -46,4 +81,13 @@ def custom_openapi():
     app.openapi_schema = openapi_schema
     return app.openapi_schema
 
-app.openapi = custom_openapi
\ No newline at end of file
+app.openapi = custom_openapi
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--dump-openapi":
+        app.openapi_schema = None
+        settings.OPENAPI_SCHEMA_PATH = ""
+        with open(sys.argv[2], "w", encoding="utf-8") as f:
+            json.dump(app.openapi(), f, ensure_ascii=False)
+    else:
+        sys.exit("usage: python main.py --dump-openapi <path>")
\ No newline at end of file
@@ -0,0 +1,108 @@
+import pytest
+from app.services.encoding import (
+    BINARY_FORMAT_STORED, BINARY_FORMAT_VERSION, BLOCK_FORMAT_VERSION,
+    decode_block, decode_blocks, decode_bytes, encode_blocks, encode_bytes, read_block_index,
+    _parse_binary_prefix,
+)
+
+KEY = b"test-key"
+TEXT = "Съешь же ещё этих мягких французских булок, да выпей чаю. ".encode("utf-8") * 40
+
+@pytest.mark.parametrize("data", [
+    TEXT,
+    b"a",
+    b"aaaaaaaa",
+    bytes(range(256)) * 4,
+    b"",
+])
+def test_bytes_round_trip(data):
+    assert decode_bytes(encode_bytes(data, KEY), KEY) == data
+
+def test_compressible_data_uses_huffman_prefix():
+    blob = encode_bytes(TEXT, KEY)
+    assert blob[0] == BINARY_FORMAT_VERSION
+    codes, padding, start = _parse_binary_prefix(blob)
+    assert 0 <= padding <= 7
+    assert set(codes) == set(TEXT)
+    assert start < len(blob)
+
+def test_incompressible_data_is_stored():
+    data = bytes(range(256))
+    blob = encode_bytes(data, KEY)
+    assert blob[0] == BINARY_FORMAT_STORED
+    assert len(blob) == len(data) + 1
+
+def test_every_truncated_prefix_is_rejected():
+    blob = encode_bytes(TEXT, KEY)
+    _, _, start = _parse_binary_prefix(blob)
+    for length in range(start):
+        with pytest.raises(ValueError):
+            _parse_binary_prefix(blob[:length])
+
+@pytest.mark.parametrize("blob, message", [
+    (b"", "Unsupported binary format"),
+    (bytes((9, 0, 0)), "Unsupported binary format"),
+    (bytes((BINARY_FORMAT_VERSION, 8, 0)), "Invalid padding"),
+    # varint 2048 — длиннее BINARY_HEADER_LIMIT
+    (bytes((BINARY_FORMAT_VERSION, 0, 0x80, 0x10)), "too long"),
+    (bytes((BINARY_FORMAT_VERSION, 0, 0x80)), "Truncated"),
+    (bytes((BINARY_FORMAT_VERSION, 0, 4, 0, 1)), "Truncated"),
+    # символ 258 вне диапазона байтов
+    (bytes((BINARY_FORMAT_VERSION, 0, 3, 0x82, 0x02, 1)), "out of range"),
+    (bytes((BINARY_FORMAT_VERSION, 0, 2, 0, 0)), "must be positive"),
+    # три кода длины 1 не образуют префиксный код
+    (bytes((BINARY_FORMAT_VERSION, 0, 6, 0, 1, 0, 1, 0, 1)), "prefix code"),
+])
+def test_corrupt_header_is_rejected(blob, message):
+    with pytest.raises(ValueError, match=message):
+        decode_bytes(blob, KEY)
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, len(TEXT), len(TEXT) * 2])
+def test_blocks_round_trip(block_size):
+    container = encode_blocks(TEXT, KEY, block_size)
+    assert decode_blocks(container, KEY) == TEXT
+    size, index = read_block_index(container)
+    assert size == block_size
+    assert len(index) == -(-len(TEXT) // block_size)
+    assert decode_block(container, KEY, len(index) - 1) == TEXT[(len(index) - 1) * block_size:]
+
+def test_block_index_is_contiguous():
+    container = encode_blocks(TEXT, KEY, 100)
+    _, index = read_block_index(container)
+    for (offset, length), (next_offset, _) in zip(index, index[1:]):
+        assert offset + length == next_offset
+    offset, length = index[-1]
+    assert offset + length == len(container)
+
+def test_empty_container():
+    container = encode_blocks(b"", KEY, 16)
+    assert read_block_index(container) == (16, [])
+    assert decode_blocks(container, KEY) == b""
+
+def test_missing_block_is_rejected():
+    container = encode_blocks(TEXT, KEY, 1024)
+    _, index = read_block_index(container)
+    with pytest.raises(ValueError, match="does not exist"):
+        decode_block(container, KEY, len(index))
+
+def test_every_truncated_container_is_rejected():
+    container = encode_blocks(TEXT, KEY, 256)
+    for length in range(len(container)):
+        with pytest.raises(ValueError):
+            read_block_index(container[:length])
+
+@pytest.mark.parametrize("container", [
+    b"",
+    bytes((BINARY_FORMAT_VERSION, 16, 0)),
+    # один блок длины 10 при пустом теле
+    bytes((BLOCK_FORMAT_VERSION, 16, 1, 10)),
+    # индекс обещает больше блоков, чем в нём длин
+    bytes((BLOCK_FORMAT_VERSION, 16, 3, 1, 1)),
+])
+def test_corrupt_container_is_rejected(container):
+    with pytest.raises(ValueError):
+        read_block_index(container)
+
+def test_invalid_block_size():
+    with pytest.raises(ValueError, match="Block size"):
+        encode_blocks(TEXT, KEY, 0)
@@ -0,0 +1,110 @@
+import base64
+import random
+import pytest
+from pydantic import ValidationError
+from app.schemas.user import DecodeRequest
+from app.services import encoding
+from app.services.encoding import (
+    DECODE_PEEK_MAX_ENTRIES, ChunkedDecoder, DecodeTable, huffman_decode, huffman_decode_bytes,
+    huffman_encode, huffman_encode_bytes,
+)
+
+TEXT = "Съешь же ещё этих мягких французских булок, да выпей чаю. " * 8
+
+def random_text(size: int, symbols: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return "".join(chr(0x4E00 + rng.randrange(symbols)) for _ in range(size))
+
+@pytest.fixture(params=["peek", "bytewise"])
+def strategy(request, monkeypatch):
+    # DECODE_TABLE_REUSE задаёт выбор стратегии: при огромном значении декодер
+    # всегда берёт peek, при нулевом — побайтовую таблицу
+    monkeypatch.setattr(encoding, "DECODE_TABLE_REUSE", 1 << 40 if request.param == "peek" else 0)
+    return request.param
+
+@pytest.mark.parametrize("text", [
+    "a",
+    "aaaaaaaaa",
+    TEXT,
+    random_text(3000, 20000),
+    random_text(3000, 20000)[:1500] + "a" * 1500,
+])
+@pytest.mark.parametrize("canonical", [False, True])
+def test_round_trip(strategy, text, canonical):
+    encoded, codes, padding = huffman_encode(text, canonical)
+    assert huffman_decode(encoded, codes, padding) == text
+
+def test_bytes_round_trip(strategy):
+    data = bytes(random.Random(1).choices(range(256), weights=range(1, 257), k=5000))
+    payload, codes, padding = huffman_encode_bytes(data)
+    assert huffman_decode_bytes(payload, codes, padding) == data
+
+def test_strategies_agree_on_large_alphabet():
+    encoded, codes, padding = huffman_encode(random_text(20000, 20000, seed=2), canonical=True)
+    data = base64.b64decode(encoded)
+    table = DecodeTable(codes)
+    peek = table.decode_peek(data, padding)
+    out, state = table.decode_bytewise(data[:-1])
+    chars, _ = table.walk(state >> 8, data[-1], 8 - padding)
+    assert "".join(peek) == "".join(out) + chars
+
+@pytest.mark.parametrize("padding", range(8))
+def test_every_padding(strategy, padding):
+    # Коды по одному биту: паддинг — это (8 - длина % 8) % 8
+    codes = {"a": "0", "b": "1"}
+    text = ("ab" * 8)[:16 - padding]
+    encoded, _, actual = huffman_encode(text, codes=codes)
+    assert actual == padding
+    assert huffman_decode(encoded, codes, padding) == text
+
+def test_strategy_choice(monkeypatch):
+    calls = []
+    peek, bytewise = DecodeTable.decode_peek, DecodeTable.decode_bytewise
+    monkeypatch.setattr(DecodeTable, "decode_peek", lambda self, *args: calls.append("peek") or peek(self, *args))
+    monkeypatch.setattr(DecodeTable, "decode_bytewise", lambda self, *args: calls.append("bytewise") or bytewise(self, *args))
+    codes = {"a": "0", "b": "10", "c": "11"}
+    table = DecodeTable(codes)
+    # Два внутренних узла — 512 строк таблицы; она окупается на DECODE_TABLE_REUSE * 512 байтах
+    threshold = 512 * encoding.DECODE_TABLE_REUSE
+    for size, expected in ((threshold - 1, "peek"), (threshold, "bytewise")):
+        calls.clear()
+        table.decode(b"\0" * size, 0)
+        assert calls == [expected]
+
+@pytest.mark.parametrize("codes", [
+    {"a": "0", "b": "01"},
+    {"a": "10", "b": "1"},
+    {"a": "0", "b": "0"},
+])
+def test_codes_that_are_not_prefix_free_are_rejected(codes):
+    with pytest.raises(ValueError, match="prefix-free"):
+        DecodeTable(codes)
+
+@pytest.mark.parametrize("codes", [{"a": "0", "b": "10"}, {}])
+def test_unknown_code_in_data_is_rejected(strategy, codes):
+    # Код 11 не принадлежит ни одному символу
+    with pytest.raises(ValueError, match="Invalid Huffman code"):
+        DecodeTable(codes).decode(b"\xff" * 4, 0)
+
+@pytest.mark.parametrize("padding", [-1, -40000000, 8, 9, 1 << 40])
+def test_padding_out_of_range_is_rejected(padding):
+    encoded, codes, _ = huffman_encode(TEXT, canonical=True)
+    with pytest.raises(ValueError, match="Padding"):
+        huffman_decode(encoded, codes, padding)
+    with pytest.raises(ValueError, match="Padding"):
+        DecodeTable(codes).decode(b"\0" * 4096, padding)
+    with pytest.raises(ValueError, match="Padding"):
+        ChunkedDecoder("key", codes, padding)
+    with pytest.raises(ValidationError):
+        DecodeRequest(encoded_data=encoded, key="key", huffman_codes=codes, padding=padding)
+
+def test_oversized_peek_tables_fall_back_to_bytewise(monkeypatch):
+    # 20000 кодов по 26 бит с разными 16-битными префиксами: у каждого префикса
+    # своя подтаблица, всего около 20 млн записей
+    codes = {chr(0x4E00 + i): format(i, "016b") + "0" * 10 for i in range(20000)}
+    table = DecodeTable(codes)
+    assert table.peek_size(table.entries, table.peek_bits) > DECODE_PEEK_MAX_ENTRIES
+    monkeypatch.setattr(DecodeTable, "peek_table", None)
+    text = "".join(chr(0x4E00 + i) for i in (0, 19999, 12345))
+    encoded, _, padding = huffman_encode(text, codes=codes)
+    assert huffman_decode(encoded, codes, padding) == text
@@ -0,0 +1,66 @@
+import pytest
+from app.services.encoding import (
+    BINARY_FORMAT_VERSION, StreamDecoder, count_frequencies, decode_bytes, decode_stream,
+    encode_bytes, encode_stream,
+)
+
+KEY = b"test-key"
+TEXT = "Съешь же ещё этих мягких французских булок, да выпей чаю. ".encode("utf-8") * 40
+
+def split(data: bytes, size: int) -> list:
+    return [data[start:start + size] for start in range(0, len(data), size)]
+
+def encode(data: bytes, size: int) -> bytes:
+    chunks = split(data, size)
+    return b"".join(encode_stream(chunks, KEY, count_frequencies(chunks)))
+
+@pytest.mark.parametrize("data", [TEXT, bytes(range(256)), b"a", b""])
+@pytest.mark.parametrize("size", [1, 5, 4096])
+def test_stream_round_trip(data, size):
+    blob = encode(data, size)
+    # Поток совпадает с форматом encode_bytes
+    assert decode_bytes(blob, KEY) == data
+    assert b"".join(decode_stream(split(blob, size), KEY)) == data
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7])
+def test_decode_stream_of_encode_bytes(size):
+    blob = encode_bytes(TEXT, KEY)
+    assert b"".join(decode_stream(split(blob, size), KEY)) == TEXT
+
+def test_prefix_is_held_until_complete():
+    blob = encode_bytes(TEXT, KEY)
+    decoder = StreamDecoder(KEY)
+    out = b""
+    for byte in split(blob, 1):
+        out += decoder.feed(byte)
+        if decoder.table is None:
+            assert out == b""
+    assert out + decoder.finish() == TEXT
+
+def test_truncated_header_fails_on_finish():
+    blob = encode_bytes(TEXT, KEY)
+    decoder = StreamDecoder(KEY)
+    assert decoder.feed(blob[:4]) == b""
+    with pytest.raises(ValueError, match="Truncated"):
+        decoder.finish()
+
+@pytest.mark.parametrize("blob, message", [
+    (bytes((9,)), "Unsupported binary format"),
+    (bytes((BINARY_FORMAT_VERSION, 8, 0)), "Invalid padding"),
+    (bytes((BINARY_FORMAT_VERSION, 0, 0x80, 0x10)), "too long"),
+    (bytes((BINARY_FORMAT_VERSION, 0, 2, 0, 0)), "must be positive"),
+    (bytes((BINARY_FORMAT_VERSION, 0, 6, 0, 1, 0, 1, 0, 1)), "prefix code"),
+    # varint длины заголовка, который не кончается
+    (bytes((BINARY_FORMAT_VERSION, 0)) + b"\x80" * 16, "Truncated"),
+])
+def test_corrupt_header_is_rejected(blob, message):
+    decoder = StreamDecoder(KEY)
+    with pytest.raises(ValueError, match=message):
+        for byte in split(blob, 1):
+            decoder.feed(byte)
+
+def test_empty_key_is_rejected():
+    with pytest.raises(ValueError):
+        StreamDecoder(b"")
+    with pytest.raises(ValueError):
+        list(encode_stream([TEXT], b"", count_frequencies([TEXT])))